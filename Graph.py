@@ -2,22 +2,38 @@
 # Defines the Graph class used to represent and visualize a multi-agent system.
 # It manages a collection of agents (nodes), visualizes their motion with matplotlib animation,
 # and optionally renders rectangular obstacles and saves simulation frames as images.
+# For long or large runs, record the trajectory headlessly and use offline_renderer.py instead.
 
 from Node import *
+from scenario_setup import setup_obstacles
 from matplotlib import pyplot as plt
 from matplotlib import animation
+import matplotlib.colors as mcolors
 import matplotlib.patches as patches
+import numpy as np
 import os
+import time
+from profiler import NULL_PROFILER
+
+# Generate a list of visually distinct colors for agent plotting
+def generate_distinct_colors(n):
+    base_colors = list(mcolors.TABLEAU_COLORS.values()) + list(mcolors.CSS4_COLORS.values())
+    np.random.seed(0)  # Seed ensures consistent color shuffling
+    np.random.shuffle(base_colors)
+    return base_colors[:n]
 
 class Graph:
-    def __init__(self):
+    def __init__(self, frame_output_dir=None, max_trail_length=None, interval=100, limits=(-6, 6, -6, 6), profiler=None):
         # Initialize the graph structure and plotting environment
         self.Nv = 0                         # Number of nodes
         self.V = []                         # List of nodes
         self.colors = []                    # Color for each node (for plotting)
-        self.traces = []                    # List of past positions (for trajectory visualization)
+        self.start_positions = []           # Initial position of each node
+        self.trace_buffer = None            # (capacity, Nv, 2) past positions, grown by doubling
+        self.trace_len = 0                  # Number of recorded trace rows
+        self.max_trail_length = max_trail_length  # If set, only the most recent positions are drawn
         self.fig = plt.figure()             # Matplotlib figure object
-        self.ax = plt.axes(xlim=(-6, 6), ylim=(-6, 6))  # Axes with fixed limits
+        self.ax = plt.axes(xlim=limits[:2], ylim=limits[2:])  # Axes with fixed limits (x_min, x_max, y_min, y_max)
         self.ax.set_aspect('equal', 'box')
 
         # Matplotlib line/marker handles for agent rendering
@@ -28,26 +44,29 @@ class Graph:
 
         self.obstacles = []                 # List of rectangular obstacles as (min_xy, max_xy)
         self.anim = None                    # Animation handle
+        self.interval = interval            # Nominal animation interval in milliseconds
+        self._last_frame_time = None        # Wall-clock time of the previous animate call
 
-        self.frame_output_dir = "frames_circle_with_obstacles_30"  # Output folder for saved frames
+        self.frame_output_dir = frame_output_dir  # Output folder for saved frames (None: do not save)
         self.frame_index = 0                # Current frame number for saving
+        self.profiler = profiler or NULL_PROFILER  # Per-phase timers and counters (profiler.Profiler), off by default
 
-    # Draw four fixed-size square obstacles at predefined locations
-    def draw_obstacles(self):
-        size = 1.5
-        centers = [(-1.5, 1.5), (1.5, 1.5), (-1.5, -1.5), (1.5, -1.5)]
-        for (cx, cy) in centers:
-            rect = patches.Rectangle((cx - size/2, cy - size/2), size, size,
+    # Draw rectangular obstacles given as (min_xy, max_xy); defaults to the four squares of "circle_with_obstacles"
+    def draw_obstacles(self, obstacles=None):
+        if obstacles is None:
+            obstacles = setup_obstacles("circle_with_obstacles")
+        for (min_xy, max_xy) in obstacles:
+            rect = patches.Rectangle(min_xy, max_xy[0] - min_xy[0], max_xy[1] - min_xy[1],
                                      linewidth=1, edgecolor='r', facecolor='gray', alpha=0.5)
             self.ax.add_patch(rect)
-            self.obstacles.append(((cx - size/2, cy - size/2), (cx + size/2, cy + size/2)))
+            self.obstacles.append((min_xy, max_xy))
 
     # Add a new agent (node) to the graph, including all visual markers
     def addNode(self, n, color):
         self.V.append(n)
         self.Nv += 1
         self.colors.append(color)
-        self.traces.append([n.state[:2].copy()])
+        self.start_positions.append(n.state[:2].copy())
 
         # Initialize plotting elements for the new agent
         dot, = self.ax.plot([], [], 'o', color=color)       # Current position
@@ -73,27 +92,61 @@ class Graph:
 
     # Launch the matplotlib animation and show the GUI
     def setupAnimation(self):
-        if not os.path.exists(self.frame_output_dir):
+        if self.frame_output_dir is not None and not os.path.exists(self.frame_output_dir):
             os.makedirs(self.frame_output_dir)
-        self.anim = animation.FuncAnimation(self.fig, self.animate, interval=100, blit=False)
+        self.anim = animation.FuncAnimation(self.fig, self.animate, interval=self.interval, blit=False,
+                                            cache_frame_data=False)
         plt.show()
 
+    # Append the current node positions to the trace buffer (doubling its capacity when full)
+    def _record_positions(self):
+        positions = np.array([node.state[:2] for node in self.V], dtype=float).reshape(-1, 2)
+        if self.trace_buffer is None or self.trace_buffer.shape[1] != self.Nv:
+            self.trace_buffer = np.empty((64, self.Nv, 2))
+            self.trace_buffer[0] = self.start_positions
+            self.trace_len = 1
+        if self.trace_len == len(self.trace_buffer):
+            grown = np.empty((2 * len(self.trace_buffer), self.Nv, 2))
+            grown[:self.trace_len] = self.trace_buffer
+            self.trace_buffer = grown
+        self.trace_buffer[self.trace_len] = positions
+        self.trace_len += 1
+        return positions
+
+    # Under load, stretch the animation interval so that drawing uses at most about half the wall time;
+    # the simulation threads keep running, so frames are skipped rather than the simulation slowed down
+    def _adapt_interval(self):
+        now = time.perf_counter()
+        if self._last_frame_time is not None and self.anim is not None and self.anim.event_source is not None:
+            current = self.anim.event_source.interval
+            render_cost_ms = 1000 * (now - self._last_frame_time) - current
+            self.anim.event_source.interval = int(max(self.interval, 2 * render_cost_ms))
+        self._last_frame_time = now
+
     # Animation update function: refresh agent states and save frames
     def animate(self, i):
-        for idx, node in enumerate(self.V):
-            pos = node.state[:2]
-            self.traces[idx].append(pos.copy())
-            xs = [p[0] for p in self.traces[idx]]
-            ys = [p[1] for p in self.traces[idx]]
+        prof = self.profiler.begin("render")
+        self._adapt_interval()
+        positions = self._record_positions()
+        prof.lap("record_positions")
+        start = 0 if self.max_trail_length is None else max(0, self.trace_len - self.max_trail_length)
+        trails = self.trace_buffer[start:self.trace_len]  # View, no per-frame list rebuilding
 
+        for idx, node in enumerate(self.V):
+            pos = positions[idx]
             self.agent_dots[idx].set_data([pos[0]], [pos[1]])
-            self.agent_trails[idx].set_data(xs, ys)
-            self.start_markers[idx].set_data([xs[0]], [ys[0]])
+            self.agent_trails[idx].set_data(trails[:, idx, 0], trails[:, idx, 1])
+            self.start_markers[idx].set_data([self.start_positions[idx][0]], [self.start_positions[idx][1]])
             self.goal_markers[idx].set_data([node.goal[0]], [node.goal[1]])
+        prof.lap("update_artists")
+        prof.count("trail_points", (self.trace_len - start) * self.Nv)
 
         # Save current frame as an image file
-        frame_path = os.path.join(self.frame_output_dir, f"frame_{self.frame_index:04d}.png")
-        self.fig.savefig(frame_path)
-        self.frame_index += 1
+        if self.frame_output_dir is not None:
+            frame_path = os.path.join(self.frame_output_dir, f"frame_{self.frame_index:04d}.png")
+            self.fig.savefig(frame_path)
+            self.frame_index += 1
+            prof.lap("save_frame")
+        prof.end()
 
         return self.agent_dots + self.agent_trails + self.start_markers + self.goal_markers
@@ -19,9 +19,13 @@ class Node(Thread):
         self.nominaldt = 0.05                               # Desired control update timestep
         self.control_function = None                        # Control callback for computing velocity
 
-    # Manually set the agent's state
+    # Manually set the agent's state (in place when possible, so shared views of the state stay valid)
     def setState(self, s):
-        self.state = np.array(s)
+        s = np.asarray(s, dtype=float)
+        if s.shape == self.state.shape:
+            self.state[:] = s
+        else:
+            self.state = np.array(s)
 
     # Retrieve the agent's current state
     def getState(self):
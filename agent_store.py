@@ -0,0 +1,193 @@
+# agent_store.py
+# Structure-of-arrays storage for controller agents.
+# All per-agent state lives in shared NumPy buffers (one row per agent) instead of small per-agent
+# arrays, so batched code reads contiguous columns without gathering. Node objects can be bound to
+# the store: their `state` and `goal` then become views of the store rows, which makes syncing
+# between the simulation nodes and the controller zero-copy. Buffers grow by doubling and removal
+# swaps the last row into the freed slot, so adding or removing agents mid-run is amortized O(1).
+
+import numpy as np
+
+class AgentHandle:
+    # Lightweight view of one agent's row in an AgentStore (no per-agent arrays are allocated)
+    __slots__ = ("store", "row", "uid")
+
+    def __init__(self, store, row, uid):
+        self.store = store                        # Owning AgentStore
+        self.row = row                            # Current row in the store buffers (updated on removal)
+        self.uid = uid                            # Unique identifier of the agent
+
+    @property
+    def position(self):
+        return self.store.state[self.row, :2]
+
+    @position.setter
+    def position(self, value):
+        self.store.state[self.row, :2] = value
+
+    @property
+    def velocity(self):
+        return self.store.velocity[self.row]
+
+    @velocity.setter
+    def velocity(self, value):
+        self.store.velocity[self.row] = value
+
+    @property
+    def goal(self):
+        return self.store.goal[self.row]
+
+    @goal.setter
+    def goal(self, value):
+        self.store.goal[self.row] = value
+
+    @property
+    def radius(self):
+        return self.store.radius[self.row]
+
+    @radius.setter
+    def radius(self, value):
+        self.store.radius[self.row] = value
+
+    @property
+    def max_speed(self):
+        return self.store.max_speed[self.row]
+
+    @max_speed.setter
+    def max_speed(self, value):
+        self.store.max_speed[self.row] = value
+
+class AgentStore:
+    def __init__(self, capacity=16):
+        # Preallocate buffers for `capacity` agents; only the first `count` rows are live
+        capacity = max(int(capacity), 1)
+        self.count = 0                                  # Number of live agents
+        self.state = np.zeros((capacity, 3))            # [x, y, theta] per agent (Node.state layout)
+        self.goal = np.zeros((capacity, 2))             # Goal position per agent
+        self.velocity = np.zeros((capacity, 2))         # Current velocity per agent
+        self.radius = np.zeros(capacity)                # Agent radius
+        self.max_speed = np.zeros(capacity)             # Maximum speed
+        self.uids = np.zeros(capacity, dtype=np.int64)  # UID of the agent in each row
+        self.handles = []                               # AgentHandle per live row, in row order
+        self.index_of = {}                              # Map from UID to row
+        self.nodes = {}                                 # Bound nodes by UID
+        self.version = 0                                # Incremented whenever rows are added, moved or removed
+
+    @property
+    def capacity(self):
+        return len(self.state)
+
+    # Live views of the packed buffers
+    @property
+    def positions(self):
+        return self.state[:self.count, :2]
+
+    @property
+    def goals(self):
+        return self.goal[:self.count]
+
+    @property
+    def velocities(self):
+        return self.velocity[:self.count]
+
+    @property
+    def radii(self):
+        return self.radius[:self.count]
+
+    @property
+    def max_speeds(self):
+        return self.max_speed[:self.count]
+
+    # Add an agent and return its handle; buffers double in size when full
+    def add(self, uid, position, goal, radius=0.1, max_speed=1.0, theta=0.0):
+        if uid in self.index_of:
+            raise ValueError(f"Duplicate agent uid: {uid}")
+        if self.count == self.capacity:
+            self._grow(2 * self.capacity)
+        row = self.count
+        self.state[row] = (position[0], position[1], theta)
+        self.goal[row] = goal
+        self.velocity[row] = 0.0
+        self.radius[row] = radius
+        self.max_speed[row] = max_speed
+        self.uids[row] = uid
+        handle = AgentHandle(self, row, uid)
+        self.handles.append(handle)
+        self.index_of[uid] = row
+        self.count += 1
+        self.version += 1
+        return handle
+
+    # Remove an agent by moving the last row into its slot; a bound node keeps a private copy of its state
+    def remove(self, uid):
+        row = self.index_of.pop(uid)
+        node = self.nodes.pop(uid, None)
+        if node is not None:
+            node.state = node.state.copy()
+            node.goal = node.goal.copy()
+        last = self.count - 1
+        if row != last:
+            for buf in (self.state, self.goal, self.velocity, self.radius, self.max_speed, self.uids):
+                buf[row] = buf[last]
+            moved = self.handles[last]
+            moved.row = row
+            self.handles[row] = moved
+            self.index_of[moved.uid] = row
+            if moved.uid in self.nodes:
+                self._bind_row(self.nodes[moved.uid], row)
+        self.handles.pop()
+        self.count -= 1
+        self.version += 1
+
+    # Make node.state and node.goal views of the agent's store rows (zero-copy sync).
+    # The node must then update them in place rather than assigning new arrays.
+    def bind_node(self, node):
+        self.nodes[node.uid] = node
+        self._bind_row(node, self.index_of[node.uid])
+
+    def is_bound(self, node):
+        return node.state.base is self.state and node.goal.base is self.goal
+
+    def _bind_row(self, node, row):
+        node.state = self.state[row]
+        node.goal = self.goal[row]
+
+    # Copies of the live rows, in row order (for checkpoints)
+    def snapshot(self):
+        n = self.count
+        return {"state": self.state[:n].copy(), "goal": self.goal[:n].copy(), "velocity": self.velocity[:n].copy(),
+                "radius": self.radius[:n].copy(), "max_speed": self.max_speed[:n].copy(), "uids": self.uids[:n].copy()}
+
+    # Overwrite all rows from a snapshot. Membership follows the snapshot: agents missing from it are
+    # removed and agents only in it are added (unbound), so crowds changed mid-run can be restored. Row
+    # order is restored too, since batched updates accumulate contributions in row order. Bound nodes
+    # are re-pointed at their new rows.
+    def restore(self, snapshot):
+        uids = [int(u) for u in snapshot["uids"]]
+        saved = set(uids)
+        for uid in [u for u in self.index_of if u not in saved]:
+            self.remove(uid)
+        for uid in uids:
+            if uid not in self.index_of:
+                self.add(uid, (0.0, 0.0), (0.0, 0.0))  # Row contents are overwritten below
+        handles = {h.uid: h for h in self.handles}
+        for name in ("state", "goal", "velocity", "radius", "max_speed", "uids"):
+            getattr(self, name)[:len(uids)] = snapshot[name]
+        self.handles = [handles[uid] for uid in uids]
+        for row, handle in enumerate(self.handles):
+            handle.row = row
+            self.index_of[handle.uid] = row
+        for uid, node in self.nodes.items():
+            self._bind_row(node, self.index_of[uid])
+        self.version += 1
+
+    def _grow(self, capacity):
+        # Reallocate every buffer and re-point bound nodes at the new memory
+        for name in ("state", "goal", "velocity", "radius", "max_speed", "uids"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+        for uid, node in self.nodes.items():
+            self._bind_row(node, self.index_of[uid])
+        self.version += 1
@@ -0,0 +1,217 @@
+# benchmark_suite.py
+# Throughput benchmarks for the simulation hot paths: PyRVOController.step, is_in_obstacle and
+# find_fallback_velocity, MetricsRecorder.record_step and Graph.animate (including the canvas draw).
+# Each benchmark runs on random_field scenarios over a range of agent and obstacle counts. Results are
+# written as JSON, can be compared against a stored baseline run to catch regressions, and are
+# summarized as scaling curves (calls/sec against N, with the fitted log-log exponent).
+#
+# Example:
+#     python benchmark_suite.py --agents 10 100 1000 10000 --obstacles 0 100 --output bench.json
+#     python benchmark_suite.py --baseline bench.json --tolerance 0.25
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+import numpy as np
+from scenario_setup import build_nodes, generate_scenario
+
+BENCHMARKS = ["step", "is_in_obstacle", "find_fallback_velocity", "record_step", "animate"]
+
+# Per-call timings of fn: the best and mean over `repeats` rounds. Each round repeats fn enough times to
+# last about min_round_time seconds, so fast calls are not dominated by timer resolution.
+def time_calls(fn, repeats=5, min_round_time=0.02):
+    start = time.perf_counter()
+    fn()
+    number = max(1, int(min_round_time / max(time.perf_counter() - start, 1e-9)))
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - start) / number)
+    return min(times), sum(times) / len(times), repeats * number
+
+# Run one benchmark on one case; returns (best, mean) seconds per call and the number of timed calls
+def run_benchmark(name, scenario, nodes, repeats=5, controller_kwargs=None):
+    from pyrvo_adapter import PyRVOController
+    from metrics_recorder import MetricsRecorder
+
+    controller = PyRVOController(nodes, obstacles=scenario.obstacle_list(), **(controller_kwargs or {}))
+    controller.step()  # Warm up caches and neighbor index buffers
+
+    if name == "step":
+        return time_calls(controller.step, repeats)
+    if name == "is_in_obstacle":
+        # One call per agent position (up to 1000 agents), reported per call
+        points = [a.position.copy() for a in controller.agents[:1000]]
+        best, mean, calls = time_calls(lambda: [controller.is_in_obstacle(p) for p in points], repeats)
+        return best / len(points), mean / len(points), calls * len(points)
+    if name == "find_fallback_velocity":
+        # Scalar fallback search for (up to) 200 agents, reported per call
+        agents = controller.agents[:200]
+        positions, goals, _, _, max_speeds = controller.gather_state()
+        pref = controller.preferred_velocities(positions.copy(), goals, max_speeds)
+        best, mean, calls = time_calls(lambda: [controller.find_fallback_velocity(a, pref[k])
+                                                for k, a in enumerate(agents)], repeats)
+        return best / len(agents), mean / len(agents), calls * len(agents)
+    if name == "record_step":
+        metrics = MetricsRecorder(nodes, store=controller.store)
+        return time_calls(metrics.record_step, repeats)
+    if name == "animate":
+        return _time_animate(nodes, scenario, repeats)
+    raise ValueError(f"Unknown benchmark: {name}")
+
+# Time Graph.animate followed by a canvas draw (what a live frame costs) on an off-screen backend
+def _time_animate(nodes, scenario, repeats):
+    import matplotlib
+    matplotlib.use("Agg")
+    from matplotlib import pyplot as plt
+    from Graph import Graph, generate_distinct_colors
+
+    graph = Graph(limits=scenario.bounds())
+    colors = generate_distinct_colors(len(nodes))
+    for k, node in enumerate(nodes):
+        graph.addNode(node, color=colors[k % len(colors)])
+    graph.draw_obstacles(scenario.obstacle_list())
+    frame = iter(range(10 ** 9))
+
+    def draw():
+        graph.animate(next(frame))
+        graph.fig.canvas.draw()
+
+    try:
+        return time_calls(draw, repeats)
+    finally:
+        plt.close(graph.fig)
+
+# Run every (benchmark, agents, obstacles) combination on random_field scenarios; animate is skipped
+# above max_render_agents
+def run_suite(agent_counts, obstacle_counts, benchmarks=BENCHMARKS, repeats=5, max_render_agents=1000,
+              seed=0, controller_kwargs=None, verbose=True):
+    results = []
+    for m in obstacle_counts:
+        for n in agent_counts:
+            scenario = generate_scenario("random_field", n, seed=seed, num_obstacles=m)
+            for name in benchmarks:
+                if name == "animate" and n > max_render_agents:
+                    continue
+                nodes = build_nodes(scenario)
+                best, mean, calls = run_benchmark(name, scenario, nodes, repeats, controller_kwargs)
+                results.append({
+                    "benchmark": name,
+                    "agents": n,
+                    "obstacles": m,
+                    "time_per_call_sec": best,
+                    "mean_time_per_call_sec": mean,
+                    "calls_per_sec": 1.0 / best if best > 0 else float("inf"),
+                    "calls": calls,
+                })
+                if verbose:
+                    print(f"{name:>24} N={n:<6} M={m:<5} {1e3 * best:10.4f} ms/call")
+    return results
+
+# Steps/sec (or calls/sec) against N per benchmark and obstacle count, with the fitted exponent k in time ~ N^k
+def scaling_curves(results):
+    curves = {}
+    for r in results:
+        curves.setdefault((r["benchmark"], r["obstacles"]), []).append((r["agents"], r["time_per_call_sec"]))
+    summary = []
+    for (name, m), points in sorted(curves.items()):
+        points.sort()
+        n = np.array([p[0] for p in points], dtype=float)
+        t = np.array([p[1] for p in points], dtype=float)
+        exponent = float(np.polyfit(np.log(n), np.log(t), 1)[0]) if len(points) > 1 else None
+        summary.append({
+            "benchmark": name,
+            "obstacles": m,
+            "agents": n.astype(int).tolist(),
+            "calls_per_sec": (1.0 / t).tolist(),
+            "scaling_exponent": exponent,
+        })
+    return summary
+
+# Compare against a baseline results file; a benchmark regresses when it is more than `tolerance` slower
+def compare_to_baseline(results, baseline, tolerance=0.25):
+    reference = {(r["benchmark"], r["agents"], r["obstacles"]): r["time_per_call_sec"] for r in baseline["results"]}
+    comparisons = []
+    for r in results:
+        key = (r["benchmark"], r["agents"], r["obstacles"])
+        if key not in reference:
+            continue
+        ratio = r["time_per_call_sec"] / reference[key]
+        comparisons.append({
+            "benchmark": r["benchmark"],
+            "agents": r["agents"],
+            "obstacles": r["obstacles"],
+            "baseline_sec": reference[key],
+            "current_sec": r["time_per_call_sec"],
+            "ratio": ratio,
+            "regression": ratio > 1.0 + tolerance,
+        })
+    return comparisons
+
+# Environment information stored with the results, so baselines from other machines are recognizable
+def environment_info():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "commit": commit,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the controller, metrics and rendering hot paths")
+    parser.add_argument("--agents", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--obstacles", type=int, nargs="+", default=[0, 100])
+    parser.add_argument("--benchmarks", nargs="+", default=BENCHMARKS, choices=BENCHMARKS)
+    parser.add_argument("--repeats", type=int, default=5, help="Timed rounds per benchmark (best is reported)")
+    parser.add_argument("--max-render-agents", type=int, default=1000, help="Largest N for the animate benchmark")
+    parser.add_argument("--engine", default="vectorized", choices=["vectorized", "scalar"])
+    parser.add_argument("--mode", default="heuristic", choices=["heuristic", "orca"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", default=None, help="Earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before flagging a regression")
+    args = parser.parse_args()
+
+    controller_kwargs = {"engine": args.engine, "mode": args.mode}
+    results = run_suite(args.agents, args.obstacles, args.benchmarks, repeats=args.repeats,
+                        max_render_agents=args.max_render_agents, seed=args.seed, controller_kwargs=controller_kwargs)
+    report = {
+        "environment": environment_info(),
+        "config": dict(vars(args)),
+        "results": results,
+        "scaling": scaling_curves(results),
+    }
+
+    print("\n===== SCALING =====")
+    for curve in report["scaling"]:
+        rates = ", ".join(f"N={n}: {r:.1f}/s" for n, r in zip(curve["agents"], curve["calls_per_sec"]))
+        exponent = "n/a" if curve["scaling_exponent"] is None else f"{curve['scaling_exponent']:.2f}"
+        print(f"{curve['benchmark']} (M={curve['obstacles']}): {rates}; time ~ N^{exponent}")
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["baseline_comparison"] = compare_to_baseline(results, json.load(f), args.tolerance)
+        print("\n===== BASELINE =====")
+        for c in report["baseline_comparison"]:
+            flag = "  REGRESSION" if c["regression"] else ""
+            print(f"{c['benchmark']} N={c['agents']} M={c['obstacles']}: x{c['ratio']:.2f}{flag}")
+        regressions = [c for c in report["baseline_comparison"] if c["regression"]]
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+    if regressions:
+        raise SystemExit(f"{len(regressions)} benchmark(s) slower than the baseline by more than {args.tolerance:.0%}")
@@ -0,0 +1,62 @@
+# checkpoint.py
+# Snapshot files for pausing, resuming and branching simulations.
+# A checkpoint is a single compressed .npz file. Nested state dictionaries (as returned by the
+# snapshot() methods of PyRVOController, MetricsRecorder and AgentStore) are flattened into
+# "/"-separated array names; scalars become 0-d arrays and strings are stored as unicode arrays.
+# Files are written to a temporary name and renamed, so a crash while saving never leaves a
+# truncated checkpoint behind.
+#
+# Example:
+#     python headless_runner.py --scenario circle --agents 400 --steps 5000 --checkpoint ck.npz --checkpoint-every 500
+#     python headless_runner.py --resume ck.npz --steps 8000
+
+import os
+import tempfile
+import numpy as np
+
+CHECKPOINT_VERSION = 1  # Stored in every file; bumped when the layout changes
+
+# Flatten {"a": {"b": x}} into {"a/b": array(x)}
+def _flatten(state, prefix=""):
+    flat = {}
+    for key, value in state.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name + "/"))
+        else:
+            flat[name] = np.asarray(value)
+    return flat
+
+# Inverse of _flatten; 0-d arrays come back as Python scalars or strings
+def _unflatten(arrays):
+    state = {}
+    for name, value in arrays.items():
+        *parents, key = name.split("/")
+        node = state
+        for p in parents:
+            node = node.setdefault(p, {})
+        node[key] = value.item() if value.ndim == 0 else value
+    return state
+
+# Write a nested state dictionary to path as one compressed .npz file
+def save_checkpoint(path, state):
+    flat = _flatten(dict(state, checkpoint_version=CHECKPOINT_VERSION))
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(suffix=".npz", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez_compressed(f, **flat)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+# Read a checkpoint written by save_checkpoint back into a nested state dictionary
+def load_checkpoint(path):
+    with np.load(path, allow_pickle=False) as data:
+        state = _unflatten({name: data[name] for name in data.files})
+    version = state.pop("checkpoint_version", None)
+    if version != CHECKPOINT_VERSION:
+        raise ValueError(f"Unsupported checkpoint version {version} in {path}")
+    return state
@@ -1,7 +1,132 @@
+import argparse
+import io
 import os
+import re
+import struct
+import numpy as np
 from PIL import Image
 
-def create_gif_from_folder(input_folder, output_gif_path, duration=100):
+def _natural_key(path):
+    # Sort key comparing digit runs as numbers, so frame_10000.png comes after frame_9999.png
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", os.path.basename(path))]
+
+def folder_image_files(input_folder):
+    # Image files in a folder, sorted by filename with frame numbers compared numerically
+    return sorted(
+        (os.path.join(input_folder, f)
+         for f in os.listdir(input_folder)
+         if f.endswith(('.png', '.jpg', '.jpeg'))),
+        key=_natural_key
+    )
+
+def iter_folder_frames(input_folder, image_files=None):
+    """
+    Lazily yield the images in a folder, sorted by filename.
+
+    Args:
+        input_folder (str): Path to the folder containing images.
+        image_files (list): Already listed image paths, if any.
+
+    Yields:
+        PIL.Image.Image: One RGB frame at a time; only the current file is open.
+    """
+    if image_files is None:
+        image_files = folder_image_files(input_folder)
+    for path in image_files:
+        with Image.open(path) as im:
+            yield im.convert("RGB")
+
+def _skip_sub_blocks(data, pos):
+    # Advance past a sequence of GIF data sub-blocks, including the zero-length terminator
+    while data[pos]:
+        pos += data[pos] + 1
+    return pos + 1
+
+def _encode_frame(image, delay_cs):
+    # Encode one frame as a standalone GIF, then re-emit its image block with its color table
+    # turned into a local one, preceded by a graphic control extension carrying the frame delay
+    buffer = io.BytesIO()
+    image.save(buffer, format="GIF")
+    data = buffer.getvalue()
+
+    packed = data[10]
+    pos = 13
+    color_table = b""
+    if packed & 0x80:
+        table_bits = packed & 0x07
+        color_table = data[pos:pos + 3 * (2 << table_bits)]
+        pos += len(color_table)
+
+    while data[pos] == 0x21:  # Skip the encoder's own extension blocks
+        pos = _skip_sub_blocks(data, pos + 2)
+    if data[pos] != 0x2C:
+        raise ValueError("Unexpected GIF block while streaming frame")
+
+    descriptor = bytearray(data[pos:pos + 10])
+    pos += 10
+    if descriptor[9] & 0x80:
+        color_table = b""  # Frame already has a local color table; it is copied with the image data
+    elif color_table:
+        descriptor[9] = (descriptor[9] & 0x78) | 0x80 | table_bits
+    image_start = pos
+    if descriptor[9] & 0x80 and not color_table:
+        pos += 3 * (2 << (descriptor[9] & 0x07))
+    pos = _skip_sub_blocks(data, pos + 1)  # LZW minimum code size, then image data sub-blocks
+
+    control = b"\x21\xF9\x04\x00" + struct.pack("<H", delay_cs) + b"\x00\x00"
+    return control + bytes(descriptor) + color_table + data[image_start:pos]
+
+def _as_image(frame):
+    # Accept PIL images or (H, W, 3/4) uint8 arrays, e.g. from offline_renderer.iter_frames
+    if isinstance(frame, Image.Image):
+        return frame.convert("RGB")
+    return Image.fromarray(np.asarray(frame, dtype=np.uint8)).convert("RGB")
+
+def write_gif_stream(frames, output_gif_path, duration=100, every=1, scale=1.0, loop=0):
+    """
+    Encode frames into a GIF one at a time, so peak memory is bounded by a single frame.
+
+    Args:
+        frames (iterable): PIL images or uint8 arrays; consumed lazily.
+        output_gif_path (str): Path to save the resulting GIF.
+        duration (int): Duration between frames in milliseconds.
+        every (int): Keep only every n-th frame (decimation).
+        scale (float): Resize factor applied to every frame (e.g. 0.5 to halve width and height).
+        loop (int): Number of loops; 0 loops forever.
+
+    Returns:
+        int: Number of frames written.
+    """
+    delay_cs = max(1, int(round(duration / 10)))
+    size = None
+    count = 0
+    with open(output_gif_path, "wb") as f:
+        try:
+            for index, frame in enumerate(frames):
+                if index % every:
+                    continue
+                image = _as_image(frame)
+                if size is None:
+                    size = image.size
+                    if scale != 1.0:
+                        size = (max(1, int(round(size[0] * scale))), max(1, int(round(size[1] * scale))))
+                    # Header, logical screen without global color table, and looping extension
+                    f.write(b"GIF89a" + struct.pack("<HHBBB", size[0], size[1], 0, 0, 0))
+                    f.write(b"\x21\xFF\x0BNETSCAPE2.0\x03\x01" + struct.pack("<H", loop) + b"\x00")
+                if image.size != size:
+                    image = image.resize(size, Image.Resampling.LANCZOS)
+                f.write(_encode_frame(image, delay_cs))
+                count += 1
+            if count == 0:
+                raise ValueError("No frames to encode.")
+            f.write(b"\x3B")
+        except BaseException:
+            f.close()
+            os.remove(output_gif_path)  # Never leave a truncated GIF behind
+            raise
+    return count
+
+def create_gif_from_folder(input_folder, output_gif_path, duration=100, every=1, scale=1.0):
     """
     Create a GIF from all images in a folder.
 
@@ -9,35 +134,52 @@ def create_gif_from_folder(input_folder, output_gif_path, duration=100):
         input_folder (str): Path to the folder containing images.
         output_gif_path (str): Path to save the resulting GIF.
         duration (int): Duration between frames in milliseconds.
+        every (int): Keep only every n-th image.
+        scale (float): Resize factor applied to every frame.
     """
     # Get list of image files, sorted by filename
-    image_files = sorted([
-        os.path.join(input_folder, f)
-        for f in os.listdir(input_folder)
-        if f.endswith(('.png', '.jpg', '.jpeg'))
-    ])
+    image_files = folder_image_files(input_folder)
 
     if not image_files:
         raise ValueError("No images found in the specified folder.")
 
-    # Load all images
-    images = [Image.open(f) for f in image_files]
+    count = write_gif_stream(iter_folder_frames(input_folder, image_files), output_gif_path,
+                             duration=duration, every=every, scale=scale)
+    print(f"GIF created successfully at {output_gif_path} ({count} frames)")
 
-    # Save as GIF
-    images[0].save(
-        output_gif_path,
-        save_all=True,
-        append_images=images[1:],
-        duration=duration,
-        loop=0
-    )
+def create_gif_from_run(run_path, output_gif_path, duration=100, every=1, scale=1.0, **renderer_kwargs):
+    """
+    Create a GIF straight from a recorded run, rendering frames in memory (no PNG files).
+
+    Args:
+        run_path (str): Run directory written by trajectory_log.TrajectoryWriter.
+        output_gif_path (str): Path to save the resulting GIF.
+        duration (int): Duration between frames in milliseconds.
+        every (int): Render only every n-th recorded step.
+        scale (float): Resize factor applied to every frame.
+        **renderer_kwargs: Passed to offline_renderer.FrameRenderer (e.g. trail_length, dpi).
+    """
+    from offline_renderer import iter_frames
 
-    print(f"GIF created successfully at {output_gif_path}")
+    count = write_gif_stream(iter_frames(run_path, stride=every, **renderer_kwargs), output_gif_path,
+                             duration=duration, scale=scale)
+    print(f"GIF created successfully at {output_gif_path} ({count} frames)")
 
 # Example usage
 if __name__ == "__main__":
-    input_folder = f"./frames_circle_with_obstacles_20"
-    output_gif_path = f"circle_with_obstacles_20.gif"
-    # Create GIF from the specified folder
-    print(f"Creating GIF from {input_folder}...")
-    create_gif_from_folder(input_folder, output_gif_path, duration=10)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Create a GIF from a frame folder or a recorded run")
+    parser.add_argument("input", nargs="?", default="./frames_circle_with_obstacles_20",
+                        help="Folder of frames, or a run directory with --from-run")
+    parser.add_argument("output", nargs="?", default="circle_with_obstacles_20.gif")
+    parser.add_argument("--from-run", action="store_true", help="Render frames from a recorded run directory")
+    parser.add_argument("--duration", type=int, default=10, help="Milliseconds per frame")
+    parser.add_argument("--every", type=int, default=1, help="Keep every n-th frame")
+    parser.add_argument("--scale", type=float, default=1.0, help="Resize factor")
+    args = parser.parse_args()
+
+    # Create GIF from the specified folder or run
+    print(f"Creating GIF from {args.input}...")
+    if args.from_run:
+        create_gif_from_run(args.input, args.output, duration=args.duration, every=args.every, scale=args.scale)
+    else:
+        create_gif_from_folder(args.input, args.output, duration=args.duration, every=args.every, scale=args.scale)
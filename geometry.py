@@ -0,0 +1,10 @@
+# geometry.py
+# Small vectorized geometry helpers shared by the controller, obstacle set and metrics.
+
+import numpy as np
+
+# Euclidean norms of the last axis, evaluated as a batched dot product so each row
+# rounds exactly like np.linalg.norm on a single 2D vector (keeps both engines in lockstep)
+def row_norms(v):
+    v = np.asarray(v, dtype=float)
+    return np.sqrt(np.matmul(v[..., None, :], v[..., :, None])[..., 0, 0])
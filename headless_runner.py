@@ -0,0 +1,252 @@
+# headless_runner.py
+# Runs RVO simulations without threads, sleeping or a GUI. The controller is stepped in a tight
+# fixed-step loop for a given number of steps or until every agent has reached its goal, so runs
+# proceed as fast as the CPU allows. This is the main entry point for scripted runs and sweeps.
+#
+# Example:
+#     python headless_runner.py --scenario circle_with_obstacles --agents 200 --steps 2000 --seed 0
+
+import argparse
+import json
+import time
+import numpy as np
+from pyrvo_adapter import PyRVOController
+from scenario_setup import SCENARIOS, build_nodes, load_scenario
+from metrics_recorder import MetricsRecorder
+from trajectory_log import TrajectoryWriter
+from profiler import Profiler
+from checkpoint import save_checkpoint, load_checkpoint
+
+class HeadlessSimulation:
+    def __init__(self, scenario_type, num_agents, seed=0, record_path=None, scenario_params=None,
+                 scenario_cache=None, profiler=None, **controller_kwargs):
+        # Build a scenario, its controller and metrics recorder; controller_kwargs go to PyRVOController.
+        # scenario_params go to the scenario generator; scenario_cache is the cache directory (False: no cache).
+        # With record_path, positions, velocities and per-step metrics are streamed to that run directory.
+        # A profiler.Profiler, if given, instruments both the controller and the metrics recorder.
+        self.scenario_type = scenario_type              # Scenario family name (see scenario_setup.SCENARIOS)
+        self.num_agents = num_agents                    # Number of agents in the scenario
+        self.seed = seed                                # Seed for scenario generation
+        self.scenario_params = dict(scenario_params or {})  # Scenario generator parameters
+        self.controller_kwargs = controller_kwargs      # PyRVOController keyword arguments (kept for checkpoints)
+
+        self.scenario = load_scenario(scenario_type, num_agents, seed=seed, cache_dir=scenario_cache,
+                                      **(scenario_params or {}))
+        self.nodes = build_nodes(self.scenario)
+        self.obstacles = self.scenario.obstacle_list()
+        self.controller = PyRVOController(self.nodes, obstacles=self.obstacles, profiler=profiler, **controller_kwargs)
+        self.metrics = MetricsRecorder(self.nodes, store=self.controller.store, profiler=profiler)
+        self.step_index = 0                             # Number of simulation steps performed
+        self.wall_time = 0.0                            # Total wall-clock time spent in step()
+
+        self.recorder = None                            # Optional trajectory writer
+        if record_path is not None:
+            self.start_recording(record_path)
+
+    # Stream positions, velocities and per-step metrics from the current step on to a run directory
+    def start_recording(self, record_path):
+        store = self.controller.store
+        params = dict(self.controller_kwargs, scenario=self.scenario_type, agents=self.num_agents, seed=self.seed,
+                      scenario_params=self.scenario.params, time_step=self.controller.time_step,
+                      start_step=self.step_index)
+        self.recorder = TrajectoryWriter(record_path, store.uids[:store.count].tolist(), store.positions,
+                                         store.goals, self.controller.obstacles.boxes, params=params)
+        self._recorded_uids = store.uids[:store.count].copy()  # Agent in each recorded column
+        self._record_rows = None                        # Store row per recorded column (-1: agent removed)
+        self._record_version = -1                       # Store version the rows were computed for
+
+    # Positions and velocities in the recording's column order. Removing or adding agents moves store rows,
+    # so columns are matched to rows by UID; removed agents are written as NaN. Agents added after the
+    # recording started have no column, so they are rejected rather than silently dropped.
+    def _recorded_state(self):
+        store = self.controller.store
+        if store.version != self._record_version:
+            rows = np.array([store.index_of.get(int(uid), -1) for uid in self._recorded_uids], dtype=np.intp)
+            if np.count_nonzero(rows >= 0) != store.count:
+                raise ValueError("Agents were added while recording; the trajectory format has a fixed set of "
+                                 "agents, so start a new recording after changing the crowd")
+            unchanged = len(rows) == store.count and np.array_equal(rows, np.arange(store.count))
+            self._record_rows = None if unchanged else rows
+            self._record_version = store.version
+        rows = self._record_rows
+        if rows is None:
+            return store.positions, store.velocities
+        present = (rows >= 0)[:, None]
+        return (np.where(present, store.state[rows, :2], np.nan), np.where(present, store.velocity[rows], np.nan))
+
+    # Save the complete simulation state (agents, obstacles, metric counters, step index, ORCA random generator)
+    def save_checkpoint(self, path):
+        save_checkpoint(path, {
+            "simulation": {
+                "scenario_type": self.scenario_type,
+                "num_agents": self.num_agents,
+                "seed": self.seed,
+                "scenario_params": json.dumps(self.scenario_params),
+                "controller_kwargs": json.dumps(self.controller_kwargs),
+                "step_index": self.step_index,
+                "wall_time": self.wall_time,
+            },
+            "controller": self.controller.snapshot(),
+            "metrics": self.metrics.snapshot(),
+        })
+
+    # Continue a simulation from a checkpoint. Stepping on reproduces the uninterrupted run exactly;
+    # controller_overrides (e.g. max_speed) branch a what-if experiment from the saved state instead.
+    @classmethod
+    def resume(cls, path, record_path=None, scenario_cache=None, profiler=None, **controller_overrides):
+        state = load_checkpoint(path)
+        info = state["simulation"]
+        controller_kwargs = dict(json.loads(info["controller_kwargs"]), **controller_overrides)
+        sim = cls(info["scenario_type"], info["num_agents"], seed=info["seed"],
+                  scenario_params=json.loads(info["scenario_params"]), scenario_cache=scenario_cache,
+                  profiler=profiler, **controller_kwargs)
+        sim.controller.restore(state["controller"])
+        sim.metrics.restore(state["metrics"])
+        sim.obstacles = sim.controller.obstacles.to_list()
+        sim.step_index = info["step_index"]
+        sim.wall_time = info["wall_time"]
+        if record_path is not None:
+            sim.start_recording(record_path)
+        return sim
+
+    # Advance the simulation by one fixed time step
+    def step(self):
+        self.metrics.sync_agents()  # Track agents added since the last step from where they joined
+        if self.recorder is not None:
+            self._recorded_state()  # Reject a changed crowd before stepping, not after
+        start = time.perf_counter()
+        self.controller.step()  # Nodes are bound to the controller's agent store, so they move with it
+        self.metrics.record_step(controller_time=self.controller.last_step_time)
+        self.step_index += 1
+        self.wall_time += time.perf_counter() - start
+
+        if self.recorder is not None:
+            metrics = self.metrics
+            positions, velocities = self._recorded_state()
+            self.recorder.append(positions, velocities,
+                                 (metrics.last_step_collisions, len(metrics.reached_goal),
+                                  self.controller.last_step_time, metrics.last_metrics_time))
+
+    # True once every agent has reached its goal (agents added or removed mid-run included)
+    def all_goals_reached(self):
+        self.metrics.sync_agents()
+        return len(self.metrics.reached_goal) == len(self.metrics.agents)
+
+    # Step until step index max_steps, all goals reached (if stop_at_goals) or max_wall_time seconds elapsed.
+    # With checkpoint_path, a checkpoint is saved every checkpoint_every steps (if set) and at the end.
+    def run(self, max_steps, stop_at_goals=True, max_wall_time=None, checkpoint_path=None, checkpoint_every=None):
+        deadline = None if max_wall_time is None else time.perf_counter() + max_wall_time
+        while self.step_index < max_steps:
+            if stop_at_goals and self.all_goals_reached():
+                break
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+            self.step()
+            if checkpoint_path and checkpoint_every and self.step_index % checkpoint_every == 0:
+                self.save_checkpoint(checkpoint_path)
+        if self.recorder is not None:
+            self.recorder.flush()
+        if checkpoint_path:
+            self.save_checkpoint(checkpoint_path)
+        return self.summary()
+
+    # Flush and close the trajectory recorder, if any
+    def close(self):
+        if self.recorder is not None:
+            self.recorder.close()
+
+    # Metrics summary extended with run information and throughput
+    def summary(self):
+        summary = self.metrics.summarize()
+        summary["all_goals_reached"] = self.all_goals_reached()
+        summary["wall_time_sec"] = self.wall_time
+        summary["steps_per_sec"] = self.step_index / self.wall_time if self.wall_time > 0 else 0.0
+        return summary
+
+# Convenience wrapper: build a simulation, run it and return its summary
+def run_headless(scenario_type, num_agents, max_steps, seed=0, stop_at_goals=True, max_wall_time=None, **controller_kwargs):
+    sim = HeadlessSimulation(scenario_type, num_agents, seed=seed, **controller_kwargs)
+    summary = sim.run(max_steps, stop_at_goals=stop_at_goals, max_wall_time=max_wall_time)
+    sim.close()
+    return summary
+
+# Command-line arguments shared by the headless entry points
+def add_simulation_args(parser):
+    parser.add_argument("--scenario", default="circle", choices=sorted(SCENARIOS), help="Scenario family")
+    parser.add_argument("--scenario-param", action="append", default=[], metavar="NAME=VALUE",
+                        help="Scenario generator parameter, e.g. width=6 (repeatable)")
+    parser.add_argument("--scenario-cache", default=None, metavar="DIR", help="Scenario cache directory")
+    parser.add_argument("--no-scenario-cache", action="store_true", help="Always regenerate the scenario")
+    parser.add_argument("--agents", type=int, default=40, help="Number of agents")
+    parser.add_argument("--steps", type=int, default=1000, help="Maximum number of simulation steps")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--mode", default="heuristic", choices=["heuristic", "orca"])
+    parser.add_argument("--engine", default="vectorized", choices=["vectorized", "scalar"])
+    parser.add_argument("--neighbor-index", default="grid", choices=["grid", "kdtree", "brute"])
+    parser.add_argument("--time-step", type=float, default=0.05)
+    parser.add_argument("--neighbor-dist", type=float, default=1.0)
+    parser.add_argument("--time-horizon", type=float, default=3.0)
+    parser.add_argument("--agent-radius", type=float, default=0.1)
+    parser.add_argument("--max-speed", type=float, default=1.0)
+    parser.add_argument("--fallback-samples", type=int, default=60)
+    parser.add_argument("--no-stop-at-goals", action="store_true", help="Always run the full number of steps")
+    parser.add_argument("--record", default=None, metavar="DIR", help="Stream the trajectory to this run directory")
+    parser.add_argument("--checkpoint", default=None, metavar="FILE", help="Save a checkpoint to this file at the end")
+    parser.add_argument("--checkpoint-every", type=int, default=None, metavar="K", help="Also checkpoint every K steps")
+    parser.add_argument("--resume", default=None, metavar="FILE",
+                        help="Continue from a checkpoint (scenario and controller options come from the file)")
+    parser.add_argument("--profile", action="store_true", help="Print per-phase timings and counters")
+    parser.add_argument("--profile-output", default=None, metavar="FILE", help="Write the profile summary as JSON")
+    parser.add_argument("--trace", default=None, metavar="FILE", help="Write a Chrome trace (chrome://tracing, Perfetto)")
+
+# PyRVOController keyword arguments from parsed command-line arguments
+def controller_kwargs_from_args(args):
+    return {
+        "mode": args.mode,
+        "engine": args.engine,
+        "neighbor_index": args.neighbor_index,
+        "time_step": args.time_step,
+        "neighbor_dist": args.neighbor_dist,
+        "time_horizon": args.time_horizon,
+        "agent_radius": args.agent_radius,
+        "max_speed": args.max_speed,
+        "num_fallback_samples": args.fallback_samples,
+    }
+
+# HeadlessSimulation scenario keyword arguments from parsed command-line arguments
+def scenario_kwargs_from_args(args):
+    params = {}
+    for item in args.scenario_param:
+        name, _, value = item.partition("=")
+        params[name] = float(value) if any(c in value for c in ".eE") else int(value)
+    return {"scenario_params": params, "scenario_cache": False if args.no_scenario_cache else args.scenario_cache}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a headless fixed-step RVO simulation")
+    add_simulation_args(parser)
+    args = parser.parse_args()
+
+    profiler = None
+    if args.profile or args.profile_output or args.trace:
+        profiler = Profiler(trace=args.trace is not None)
+
+    if args.resume:
+        sim = HeadlessSimulation.resume(args.resume, record_path=args.record, profiler=profiler,
+                                        scenario_cache=scenario_kwargs_from_args(args)["scenario_cache"])
+        print(f"Resuming {sim.scenario_type} with {sim.num_agents} agents at step {sim.step_index}, up to step {args.steps}.")
+    else:
+        print(f"Running headless simulation: {args.scenario} with {args.agents} agents for up to {args.steps} steps.")
+        sim = HeadlessSimulation(args.scenario, args.agents, seed=args.seed, record_path=args.record, profiler=profiler,
+                                 **scenario_kwargs_from_args(args), **controller_kwargs_from_args(args))
+    sim.run(args.steps, stop_at_goals=not args.no_stop_at_goals, checkpoint_path=args.checkpoint,
+            checkpoint_every=args.checkpoint_every)
+    sim.close()
+    sim.metrics.print_summary()
+    print(f"wall_time_sec: {sim.wall_time:.4f}")
+    print(f"steps_per_sec: {sim.summary()['steps_per_sec']:.1f}")
+    if profiler is not None:
+        profiler.print_summary()
+        if args.profile_output:
+            profiler.write_summary(args.profile_output)
+        if args.trace:
+            profiler.write_trace(args.trace)
@@ -5,26 +5,21 @@
 
 from Graph import *
 from pyrvo_adapter import PyRVOController
-from scenario_setup import setup_scenario
+from scenario_setup import load_scenario
 from metrics_recorder import MetricsRecorder
-import numpy as np
-import matplotlib.colors as mcolors
-
-# Generate a list of visually distinct colors for agent plotting
-def generate_distinct_colors(n):
-    base_colors = list(mcolors.TABLEAU_COLORS.values()) + list(mcolors.CSS4_COLORS.values())
-    np.random.seed(0)  # Seed ensures consistent color shuffling
-    np.random.shuffle(base_colors)
-    return base_colors[:n]
+from tick_scheduler import TickScheduler
+from profiler import Profiler
+import time
 
 # Create a set of agents with initial positions and goals based on the specified scenario
-def generate_agents(num_agents, scenario_type):
-    G = Graph()
+def generate_agents(num_agents, scenario_type, frame_output_dir=None, seed=0, profiler=None):
+    scenario = load_scenario(scenario_type, num_agents, seed=seed)
+    G = Graph(frame_output_dir=frame_output_dir, limits=scenario.bounds(), profiler=profiler)
     agents = []
     colors = generate_distinct_colors(num_agents)
 
-    # Get initial position and goal pairs from predefined scenario setup
-    positions_goals = setup_scenario(scenario_type, num_agents)
+    # Get initial position and goal pairs from the generated scenario
+    positions_goals = scenario.agents_info()
 
     for uid, (pos, goal) in enumerate(positions_goals):
         node = Node(uid)  # Create a new agent node with unique ID
@@ -33,41 +28,53 @@ def generate_agents(num_agents, scenario_type):
         agents.append(node)
         G.addNode(node, color=colors[uid])  # Add agent node to graph with a color
 
+    # Draw the scenario's obstacles, if any; the controller picks them up from the graph
+    if len(scenario.obstacles):
+        G.draw_obstacles(scenario.obstacle_list())
+
     return G, agents
 
 # Main simulation logic
 if __name__ == '__main__':
     num_agents = 40
-    scenario_type = "circle"  # Available: "circle", "circle_with_obstacles", etc.
+    scenario_type = "circle"  # Any family in scenario_setup.SCENARIOS, e.g. "circle_with_obstacles", "maze"
+    live_view = True          # Show the matplotlib animation; if False, run without GUI for max_run_time seconds
+    save_frames = True        # Save every displayed frame (for exact frames, record headlessly and use offline_renderer.py)
+    max_run_time = 60.0       # Wall-clock limit for runs without live view
+    profile = False           # Print per-phase timings of the controller, metrics and rendering at the end
+    profiler = Profiler() if profile else None
 
     # Generate the agent graph and initialize agents
-    G, agents = generate_agents(num_agents, scenario_type)
-
-    # Optional: draw obstacles if the scenario includes them
-    if scenario_type == "circle_with_obstacles":
-        G.draw_obstacles()
+    frame_output_dir = f"frames_{scenario_type}_{num_agents}" if save_frames else None
+    G, agents = generate_agents(num_agents, scenario_type, frame_output_dir=frame_output_dir, profiler=profiler)
 
-    # Initialize the RVO controller and the metrics recorder
-    rvo_controller = PyRVOController(agents, graph=G)
-    metrics = MetricsRecorder(agents)
+    # Initialize the RVO controller and the metrics recorder. The Node threads integrate their own motion,
+    # so their state is copied into the controller each tick instead of being bound to its agent store
+    # (a bound state would be moved by both the controller step and Node.systemdynamics).
+    rvo_controller = PyRVOController(agents, graph=G, profiler=profiler, bind_nodes=False)
+    metrics = MetricsRecorder(agents, profiler=profiler)
 
-    # Define the control function used by each agent to update velocity
-    def control_fn(agent):
-        rvo_controller.update_from_nodes(agents)
-        rvo_controller.step()
-        metrics.record_step()
-        return rvo_controller.get_velocity(agent.uid)
+    # Run one controller step and one metrics record per tick, shared by all agent threads
+    scheduler = TickScheduler(agents, rvo_controller, metrics)
 
     # Assign the control function to each agent
     for node in agents:
-        node.control_function = control_fn
+        node.control_function = scheduler.control_fn
 
     # Start the simulation
     print(f"Starting PyRVO-based multi-agent simulation: {scenario_type} with {num_agents} agents.")
     G.run()
-    G.setupAnimation()
+    if live_view:
+        G.setupAnimation()
+    else:
+        deadline = time.time() + max_run_time
+        while time.time() < deadline and len(metrics.reached_goal) < num_agents:
+            time.sleep(0.1)
+    scheduler.stop()
     G.stop()
 
     # Print final performance metrics after simulation
     metrics.print_summary()
+    if profiler is not None:
+        profiler.print_summary()
     print("Simulation ended.")
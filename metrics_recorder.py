@@ -4,61 +4,155 @@
 
 import numpy as np
 import time
+from neighbor_index import UniformGridIndex
+from geometry import row_norms
+from profiler import NULL_PROFILER
 
 class MetricsRecorder:
-    def __init__(self, agents, radius=0.3):
-        # Initialize metrics tracking for a list of agents
-        self.agents = agents                           # List of all agent objects
+    def __init__(self, agents, radius=0.3, store=None, profiler=None):
+        # Initialize metrics tracking for a list of agents; with an AgentStore, positions and goals are read from it directly
+        self.agents = list(agents)                     # Agents being tracked (follows the store's membership, if given)
+        self.store = store                             # Optional AgentStore holding the agents' state
         self.radius = radius                           # Agent radius (used for collision detection)
         self.step_count = 0                            # Total simulation steps recorded
-        self.total_step_time = 0.0                     # Cumulative time spent per step
+        self.total_step_time = 0.0                     # Cumulative controller time per step (as reported by callers)
+        self.total_metrics_time = 0.0                  # Cumulative time spent inside record_step
+        self.last_metrics_time = 0.0                   # Time spent in the most recent record_step call
         self.collision_events = 0                      # Number of detected near-collisions
+        self.last_step_collisions = 0                  # Near-collisions detected in the most recent step
         self.start_positions = {a.uid: np.array(a.state[:2]) for a in agents}  # Initial positions
         self.arrival_times = {}                        # Step index at which each agent reached goal
         self.goal_threshold = 0.3                      # Distance threshold to consider goal reached
         self.reached_goal = set()                      # Set of agent UIDs that reached their goals
+        self.reached_mask = np.zeros(len(agents), dtype=bool)  # Per-agent goal flags, aligned with self.agents
+        self.neighbor_index = UniformGridIndex(cell_size=2 * radius)  # Candidate search for collision pairs
+        self._store_rows = None                        # Store rows of self.agents, refreshed when the store changes
+        self._store_version = -1
+        self.profiler = profiler or NULL_PROFILER      # Per-phase timers and counters (profiler.Profiler), off by default
 
-    # Call once per simulation step to update metrics
-    def record_step(self):
-        start_time = time.time()
+    # Follow agents added to or removed from the store mid-run. Removed agents are dropped together with
+    # their progress; added agents are tracked from their current position on. Without a store the
+    # agent list is fixed.
+    def sync_agents(self):
+        store = self.store
+        if store is None or store.version == self._store_version:
+            return
+        live = store.index_of
+        if len(self.agents) != store.count or any(a.uid not in live for a in self.agents):
+            keep = [k for k, a in enumerate(self.agents) if a.uid in live]
+            for a in self.agents:
+                if a.uid not in live:
+                    self.start_positions.pop(a.uid, None)
+                    self.arrival_times.pop(a.uid, None)
+                    self.reached_goal.discard(a.uid)
+            tracked = {self.agents[k].uid for k in keep}
+            added = [h for h in store.handles if h.uid not in tracked]
+            self.agents = [self.agents[k] for k in keep] + [store.nodes.get(h.uid, h) for h in added]
+            self.reached_mask = np.concatenate([self.reached_mask[keep], np.zeros(len(added), dtype=bool)])
+            for h in added:
+                self.start_positions[h.uid] = np.array(h.position)
+        self._store_rows = np.array([live[a.uid] for a in self.agents], dtype=np.intp)
+        self._store_version = store.version
 
-        # Detect pairwise collisions between agents (based on proximity)
-        positions = [a.state[:2] for a in self.agents]
-        N = len(positions)
-        for i in range(N):
-            for j in range(i + 1, N):
-                d = np.linalg.norm(positions[i] - positions[j])
-                if d < 2 * self.radius:
-                    self.collision_events += 1
+    # Current (N, 2) positions and goals of self.agents
+    def _gather(self):
+        store = self.store
+        if store is None:
+            positions = np.array([a.state[:2] for a in self.agents], dtype=float).reshape(-1, 2)
+            goals = np.array([a.goal for a in self.agents], dtype=float).reshape(-1, 2)
+            return positions, goals
+        self.sync_agents()
+        return store.state[self._store_rows, :2], store.goal[self._store_rows]
+
+    # Call once per simulation step to update metrics; controller_time is the caller-measured controller step time.
+    # positions optionally overrides the agents' current positions (e.g. when replaying a recorded run).
+    def record_step(self, controller_time=None, positions=None):
+        start_time = time.perf_counter()
+        prof = self.profiler.begin("metrics")
+        current, goals = self._gather()
+        positions = current if positions is None else np.asarray(positions, dtype=float)
+        prof.lap("gather")
+
+        # Detect pairwise collisions between agents (based on proximity), counting each pair once
+        self.neighbor_index.build(positions)
+        i_idx, j_idx = self.neighbor_index.query_pairs(2 * self.radius)
+        upper = i_idx < j_idx
+        i_idx, j_idx = i_idx[upper], j_idx[upper]
+        d = row_norms(positions[i_idx] - positions[j_idx])
+        self.last_step_collisions = int(np.count_nonzero(d < 2 * self.radius))
+        self.collision_events += self.last_step_collisions
+        prof.lap("collisions")
+        prof.count("collision_pairs", len(i_idx))
 
         # Check if any agents have newly reached their goal
-        for a in self.agents:
-            if a.uid in self.reached_goal:
-                continue
-            if np.linalg.norm(a.state[:2] - a.goal) < self.goal_threshold:
-                self.arrival_times[a.uid] = self.step_count
-                self.reached_goal.add(a.uid)
-
-        self.total_step_time += time.time() - start_time
+        arrived = ~self.reached_mask & (row_norms(positions - goals) < self.goal_threshold)
+        for idx in np.nonzero(arrived)[0]:
+            uid = self.agents[idx].uid
+            self.arrival_times[uid] = self.step_count
+            self.reached_goal.add(uid)
+        self.reached_mask |= arrived
+        prof.lap("goals")
+        prof.end()
+
+        if controller_time is not None:
+            self.total_step_time += controller_time
+        self.last_metrics_time = time.perf_counter() - start_time
+        self.total_metrics_time += self.last_metrics_time
         self.step_count += 1
 
+    # Counters and per-agent progress for checkpoints; per-agent arrays follow the order of self.agents
+    def snapshot(self):
+        return {
+            "step_count": self.step_count,
+            "total_step_time": self.total_step_time,
+            "total_metrics_time": self.total_metrics_time,
+            "last_metrics_time": self.last_metrics_time,
+            "collision_events": self.collision_events,
+            "last_step_collisions": self.last_step_collisions,
+            "uids": np.array([a.uid for a in self.agents], dtype=np.int64),
+            "start_positions": np.array([self.start_positions[a.uid] for a in self.agents], dtype=float).reshape(-1, 2),
+            "arrival_times": np.array([self.arrival_times.get(a.uid, -1) for a in self.agents], dtype=np.int64),
+        }
+
+    # Restore counters saved by snapshot(); agents are matched by UID. With a store (restored first), the
+    # recorded agents follow its membership, so snapshots taken after agents were added or removed work too.
+    def restore(self, snapshot):
+        self.sync_agents()
+        self.step_count = int(snapshot["step_count"])
+        self.total_step_time = float(snapshot["total_step_time"])
+        self.total_metrics_time = float(snapshot["total_metrics_time"])
+        self.last_metrics_time = float(snapshot["last_metrics_time"])
+        self.collision_events = int(snapshot["collision_events"])
+        self.last_step_collisions = int(snapshot["last_step_collisions"])
+        saved = {int(uid): k for k, uid in enumerate(snapshot["uids"])}
+        if sorted(saved) != sorted(a.uid for a in self.agents):
+            raise ValueError("Snapshot agents do not match the recorded agents")
+        rows = np.array([saved[a.uid] for a in self.agents], dtype=np.intp)
+        arrival = np.asarray(snapshot["arrival_times"])[rows]
+        self.start_positions = {a.uid: np.array(p) for a, p in zip(self.agents, np.asarray(snapshot["start_positions"])[rows])}
+        self.arrival_times = {a.uid: int(t) for a, t in zip(self.agents, arrival) if t >= 0}
+        self.reached_goal = set(self.arrival_times)
+        self.reached_mask = arrival >= 0
+
     # Compute a dictionary summary of all metrics tracked so far
     def summarize(self):
         N = len(self.agents)
         collision_rate = self.collision_events / self.step_count if self.step_count else 0
 
         # Compute path efficiency: actual distance traveled / straight-line distance
+        positions, goals = self._gather()
         path_efficiencies = []
-        for a in self.agents:
+        for k, a in enumerate(self.agents):
             start = self.start_positions[a.uid]
-            end = a.goal
+            end = goals[k]
             straight = np.linalg.norm(end - start)
-            actual = np.linalg.norm(a.state[:2] - start)
+            actual = np.linalg.norm(positions[k] - start)
             if straight > 1e-6:
                 path_efficiencies.append(actual / straight)
 
         avg_path_eff = np.mean(path_efficiencies) if path_efficiencies else 0
         avg_step_time = self.total_step_time / self.step_count if self.step_count else 0
+        avg_metrics_time = self.total_metrics_time / self.step_count if self.step_count else 0
 
         summary = {
             "steps": self.step_count,
@@ -66,6 +160,7 @@ class MetricsRecorder:
             "collision_rate": collision_rate,
             "avg_path_efficiency": avg_path_eff,
             "avg_step_time_sec": avg_step_time,
+            "avg_metrics_time_sec": avg_metrics_time,
             "goals_reached": len(self.reached_goal)
         }
 
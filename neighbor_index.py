@@ -0,0 +1,188 @@
+# neighbor_index.py
+# Provides spatial neighbor indices used to limit agent-agent interactions to nearby candidates.
+# Each index is rebuilt (or cheaply updated) from agent positions every step and returns ordered
+# (i, j) candidate pairs within a cutoff radius, sorted by i then j so that callers can accumulate
+# per-agent contributions in the same order as a brute-force loop.
+# Run as a script with --benchmark to compare the indices against brute force.
+
+import argparse
+import time
+import numpy as np
+
+# Relative slack on the squared cutoff so candidates are a superset of the exact-norm neighbors
+_CUTOFF_SLACK = 1e-9
+
+# Sort (i, j) pairs by i then j and return them as int arrays
+def _sorted_pairs(i_idx, j_idx):
+    order = np.lexsort((j_idx, i_idx))
+    return i_idx[order].astype(np.intp), j_idx[order].astype(np.intp)
+
+def _within(positions, i_idx, j_idx, radius):
+    rel = positions[j_idx] - positions[i_idx]
+    d2 = rel[:, 0] * rel[:, 0] + rel[:, 1] * rel[:, 1]
+    return d2 <= radius * radius * (1.0 + _CUTOFF_SLACK)
+
+class BruteForceIndex:
+    # Checks every pair of agents: O(N^2) time and memory, used as the reference
+    def __init__(self):
+        self.positions = np.zeros((0, 2))
+
+    def build(self, positions):
+        self.positions = np.asarray(positions, dtype=float)
+
+    def query_pairs(self, radius):
+        N = len(self.positions)
+        rel = self.positions[None, :, :] - self.positions[:, None, :]
+        d2 = rel[..., 0] * rel[..., 0] + rel[..., 1] * rel[..., 1]
+        mask = d2 <= radius * radius * (1.0 + _CUTOFF_SLACK)
+        mask[np.arange(N), np.arange(N)] = False
+        i_idx, j_idx = np.nonzero(mask)  # Row-major order is already sorted by i then j
+        return i_idx, j_idx
+
+class UniformGridIndex:
+    # Buckets agents into square cells of size cell_size and only compares agents in nearby cells
+    def __init__(self, cell_size=1.0):
+        if cell_size <= 0:
+            raise ValueError("cell_size must be positive")
+        self.cell_size = cell_size                  # Edge length of a grid cell
+        self.positions = np.zeros((0, 2))
+        self.cells = np.zeros((0, 2), dtype=np.int64)  # Integer cell coordinates of each agent
+        self.order = np.zeros(0, dtype=np.intp)     # Agent indices sorted by cell key
+        self.sorted_keys = np.zeros(0, dtype=np.int64)
+        self._origin = np.zeros(2, dtype=np.int64)
+        self._span = np.zeros(2, dtype=np.int64)
+        self._width = 0
+        self.rebuilds = 0                           # Number of full re-sorts performed
+
+    def build(self, positions):
+        # Assign agents to cells; the sort is skipped when no agent changed cell since the last call
+        self.positions = np.asarray(positions, dtype=float)
+        cells = np.floor(self.positions / self.cell_size).astype(np.int64)
+        if cells.shape == self.cells.shape and np.array_equal(cells, self.cells):
+            return
+        self.cells = cells
+        if len(cells) == 0:
+            self.order = np.zeros(0, dtype=np.intp)
+            self.sorted_keys = np.zeros(0, dtype=np.int64)
+            return
+        self._origin = cells.min(axis=0)
+        self._span = cells.max(axis=0) - self._origin
+        self._width = 0  # Set per query, as the padding depends on the search ring
+        self.rebuilds += 1
+
+    def _keys(self, cells, ring):
+        # Linear cell keys, padded by `ring` cells on each side so neighbor offsets never wrap
+        width = int(self._span[1]) + 2 * ring + 1
+        shifted = cells - self._origin + ring
+        return shifted[:, 0] * width + shifted[:, 1], width
+
+    def query_pairs(self, radius):
+        N = len(self.positions)
+        if N == 0:
+            empty = np.zeros(0, dtype=np.intp)
+            return empty, empty
+        ring = int(np.ceil(radius / self.cell_size))
+        keys, width = self._keys(self.cells, ring)
+        if width != self._width:
+            self.order = np.argsort(keys, kind="stable")
+            self.sorted_keys = keys[self.order]
+            self._width = width
+
+        # For every agent and every neighboring cell offset, find the run of agents in that cell
+        offsets = np.arange(-ring, ring + 1)
+        dx, dy = np.meshgrid(offsets, offsets, indexing="ij")
+        key_offsets = (dx * width + dy).ravel()
+        query_keys = keys[:, None] + key_offsets[None, :]
+        starts = np.searchsorted(self.sorted_keys, query_keys, side="left")
+        ends = np.searchsorted(self.sorted_keys, query_keys, side="right")
+        counts = (ends - starts).ravel()
+
+        # Expand the runs into flat (i, j) candidate pairs
+        total = int(counts.sum())
+        i_idx = np.repeat(np.repeat(np.arange(N), len(key_offsets)), counts)
+        run_starts = np.repeat(starts.ravel(), counts)
+        run_offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        j_idx = self.order[run_starts + run_offsets]
+
+        keep = (i_idx != j_idx)
+        i_idx, j_idx = i_idx[keep], j_idx[keep]
+        keep = _within(self.positions, i_idx, j_idx, radius)
+        return _sorted_pairs(i_idx[keep], j_idx[keep])
+
+class KDTreeIndex:
+    # Wraps scipy.spatial.cKDTree (optional dependency); useful for strongly clustered crowds
+    def __init__(self, leafsize=16):
+        try:
+            from scipy.spatial import cKDTree
+        except ImportError as e:
+            raise ImportError("KDTreeIndex requires scipy (pip install scipy)") from e
+        self._tree_cls = cKDTree
+        self.leafsize = leafsize
+        self.positions = np.zeros((0, 2))
+        self.tree = None
+
+    def build(self, positions):
+        self.positions = np.asarray(positions, dtype=float)
+        self.tree = self._tree_cls(self.positions, leafsize=self.leafsize)
+
+    def query_pairs(self, radius):
+        if self.tree is None or len(self.positions) == 0:
+            empty = np.zeros(0, dtype=np.intp)
+            return empty, empty
+        pairs = self.tree.query_pairs(radius * (1.0 + _CUTOFF_SLACK), output_type="ndarray")
+        i_idx = np.concatenate([pairs[:, 0], pairs[:, 1]])
+        j_idx = np.concatenate([pairs[:, 1], pairs[:, 0]])
+        return _sorted_pairs(i_idx, j_idx)
+
+# Create a neighbor index from a name ("grid", "kdtree", "brute"), an existing index, or None (brute force)
+def make_neighbor_index(kind, cell_size=1.0):
+    if kind is None or kind == "brute":
+        return BruteForceIndex()
+    if kind == "grid":
+        return UniformGridIndex(cell_size=cell_size)
+    if kind == "kdtree":
+        return KDTreeIndex()
+    if hasattr(kind, "build") and hasattr(kind, "query_pairs"):
+        return kind
+    raise ValueError(f"Unknown neighbor index: {kind}")
+
+# Time PyRVOController.step with each neighbor index on random crowds of constant density
+def benchmark(agent_counts, kinds, steps=5, density=1.0, seed=0):
+    from pyrvo_adapter import PyRVOController
+    from scenario_setup import build_nodes, generate_scenario
+
+    results = []
+    for n in agent_counts:
+        crowd = generate_scenario("random_crowd", n, seed=seed, density=density)
+        reference = None
+        for kind in kinds:
+            controller = PyRVOController(build_nodes(crowd), neighbor_index=kind)
+            start = time.perf_counter()
+            for _ in range(steps):
+                controller.step()
+            elapsed = (time.perf_counter() - start) / steps
+            positions = np.array([a.position for a in controller.agents])
+            if reference is None:
+                reference = positions
+            results.append({
+                "agents": n,
+                "index": kind,
+                "step_time_sec": elapsed,
+                "matches_first": bool(np.array_equal(positions, reference)),
+            })
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Neighbor index utilities")
+    parser.add_argument("--benchmark", action="store_true", help="Compare neighbor indices against brute force")
+    parser.add_argument("--agents", type=int, nargs="+", default=[100, 500, 1000, 2000])
+    parser.add_argument("--indices", nargs="+", default=["brute", "grid"], help="Any of: brute, grid, kdtree")
+    parser.add_argument("--steps", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.benchmark:
+        print(f"{'agents':>8} {'index':>8} {'step [ms]':>10} {'matches':>8}")
+        for r in benchmark(args.agents, args.indices, steps=args.steps):
+            print(f"{r['agents']:>8} {r['index']:>8} {1000 * r['step_time_sec']:>10.2f} {str(r['matches_first']):>8}")
+    else:
+        parser.print_help()
@@ -0,0 +1,123 @@
+# obstacles.py
+# Array-backed set of axis-aligned rectangular obstacles with batched queries.
+# Rectangles are packed into an (M, 4) array of [min_x, min_y, max_x, max_y] rows; point-in-rectangle
+# and closest-point queries run for many points at once. Large maps additionally get a uniform-grid
+# broad phase that maps each cell to the rectangles overlapping it, so query cost depends on the
+# number of nearby rectangles rather than on the size of the map.
+
+import numpy as np
+from geometry import row_norms
+
+class ObstacleSet:
+    def __init__(self, obstacles=(), cell_size=1.0, broad_phase_threshold=32):
+        # obstacles: iterable of (min_xy, max_xy) corner pairs, or an (M, 4) array
+        self.cell_size = cell_size                          # Edge length of a broad-phase grid cell
+        self.broad_phase_threshold = broad_phase_threshold  # Minimum rectangle count that enables the grid
+        self.boxes = np.zeros((0, 4))                       # Packed rectangles [min_x, min_y, max_x, max_y]
+        self.extend(obstacles)
+
+    def __len__(self):
+        return len(self.boxes)
+
+    # Iterate as (min_xy, max_xy) tuples, matching the list-of-corners representation
+    def __iter__(self):
+        for b in self.boxes:
+            yield (b[0], b[1]), (b[2], b[3])
+
+    # Add rectangles given as (min_xy, max_xy) pairs or an (M, 4) array, then rebuild the broad phase
+    def extend(self, obstacles):
+        boxes = np.asarray(list(obstacles) if not isinstance(obstacles, np.ndarray) else obstacles, dtype=float)
+        self.boxes = np.concatenate([self.boxes, boxes.reshape(-1, 4)])
+        self._build_grid()
+
+    # Add a single rectangle
+    def add(self, min_xy, max_xy):
+        self.extend([(min_xy, max_xy)])
+
+    # Corner pairs as a list of ((min_x, min_y), (max_x, max_y)) tuples
+    def to_list(self):
+        return list(self)
+
+    @property
+    def uses_broad_phase(self):
+        return len(self.boxes) >= self.broad_phase_threshold
+
+    def _build_grid(self):
+        # Register every rectangle in each grid cell it overlaps, stored CSR-style sorted by cell key
+        if not self.uses_broad_phase:
+            self._cell_keys = self._cell_boxes = None
+            return
+        lo = np.floor(self.boxes[:, :2] / self.cell_size).astype(np.int64)
+        hi = np.floor(self.boxes[:, 2:] / self.cell_size).astype(np.int64)
+        self._lo = lo.min(axis=0)
+        self._hi = hi.max(axis=0)
+        self._width = int(self._hi[1] - self._lo[1]) + 1
+
+        spans = hi - lo + 1
+        counts = spans[:, 0] * spans[:, 1]
+        box_ids = np.repeat(np.arange(len(self.boxes)), counts)
+        local = np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts)
+        cx = lo[box_ids, 0] + local // spans[box_ids, 1]
+        cy = lo[box_ids, 1] + local % spans[box_ids, 1]
+        keys = (cx - self._lo[0]) * self._width + (cy - self._lo[1])
+        order = np.argsort(keys, kind="stable")
+        self._cell_keys = keys[order]
+        self._cell_boxes = box_ids[order]
+
+    def _candidates(self, points, ring):
+        # (point, rectangle) candidate pairs whose cells lie within `ring` cells of the point, sorted and unique
+        P, M = len(points), len(self.boxes)
+        if not self.uses_broad_phase:
+            return np.repeat(np.arange(P), M), np.tile(np.arange(M), P)
+
+        cells = np.floor(points / self.cell_size).astype(np.int64)
+        offsets = np.arange(-ring, ring + 1)
+        dx, dy = np.meshgrid(offsets, offsets, indexing="ij")
+        qx = cells[:, 0, None] + dx.ravel()[None, :]
+        qy = cells[:, 1, None] + dy.ravel()[None, :]
+        valid = (qx >= self._lo[0]) & (qx <= self._hi[0]) & (qy >= self._lo[1]) & (qy <= self._hi[1])
+        keys = np.where(valid, (qx - self._lo[0]) * self._width + (qy - self._lo[1]), -1)
+        starts = np.searchsorted(self._cell_keys, keys, side="left")
+        ends = np.searchsorted(self._cell_keys, keys, side="right")
+        counts = np.where(valid, ends - starts, 0).ravel()
+
+        total = int(counts.sum())
+        point_ids = np.repeat(np.repeat(np.arange(P), qx.shape[1]), counts)
+        run = np.repeat(starts.ravel(), counts) + np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        pair_keys = np.unique(point_ids * M + self._cell_boxes[run])  # Dedupe rectangles seen from several cells
+        return pair_keys // M, pair_keys % M
+
+    # Boolean mask of which (P, 2) points lie inside (or on the border of) any rectangle
+    def contains(self, points):
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        inside = np.zeros(len(points), dtype=bool)
+        if len(self.boxes) == 0 or len(points) == 0:
+            return inside
+        if not self.uses_broad_phase:
+            b = self.boxes
+            hit = ((b[None, :, 0] <= points[:, 0, None]) & (points[:, 0, None] <= b[None, :, 2]) &
+                   (b[None, :, 1] <= points[:, 1, None]) & (points[:, 1, None] <= b[None, :, 3]))
+            return hit.any(axis=1)
+        i_idx, k_idx = self._candidates(points, 0)
+        p, b = points[i_idx], self.boxes[k_idx]
+        hit = (b[:, 0] <= p[:, 0]) & (p[:, 0] <= b[:, 2]) & (b[:, 1] <= p[:, 1]) & (p[:, 1] <= b[:, 3])
+        inside[i_idx[hit]] = True
+        return inside
+
+    # Closest point on rectangle k_idx[n] to points[i_idx[n]] (points inside a rectangle map to themselves)
+    def closest_points(self, points, i_idx, k_idx):
+        b = self.boxes[k_idx]
+        return np.clip(np.asarray(points, dtype=float)[i_idx], b[:, :2], b[:, 2:])
+
+    # All (point, rectangle) pairs closer than cutoff, sorted by point then rectangle.
+    # Returns (i_idx, k_idx, rel, dist) with rel = point - closest point on the rectangle.
+    def query_within(self, points, cutoff):
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        if len(self.boxes) == 0 or len(points) == 0:
+            empty = np.zeros(0, dtype=np.intp)
+            return empty, empty, np.zeros((0, 2)), np.zeros(0)
+        i_idx, k_idx = self._candidates(points, int(np.ceil(cutoff / self.cell_size)))
+        rel = points[i_idx] - self.closest_points(points, i_idx, k_idx)
+        dist = row_norms(rel)
+        keep = dist < cutoff
+        return i_idx[keep], k_idx[keep], rel[keep], dist[keep]
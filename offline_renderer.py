@@ -0,0 +1,116 @@
+# offline_renderer.py
+# Renders frames from a recorded run (see trajectory_log.py) instead of from the live simulation.
+# Each worker process opens the memory-mapped trajectory, creates its figure and artists once and
+# then only updates their data per frame; trails are views into the recorded positions, so no
+# per-frame lists are rebuilt. Frames are split into contiguous chunks across worker processes.
+#
+# Example:
+#     python headless_runner.py --scenario circle_with_obstacles --agents 40 --record runs/c40
+#     python offline_renderer.py runs/c40 --output-dir frames_c40 --workers 4
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+import matplotlib.patches as patches
+from trajectory_log import TrajectoryReader
+from scenario_setup import Scenario
+
+class FrameRenderer:
+    def __init__(self, run, limits=None, trail_length=None, dpi=100, figsize=(6.4, 4.8)):
+        # Build the figure and all artists for a TrajectoryReader once
+        from Graph import generate_distinct_colors
+
+        self.run = run                                  # Recorded run being rendered
+        self.trail_length = trail_length                # Steps of trail to draw (None: full history)
+        self.dpi = dpi
+        self.fig = Figure(figsize=figsize, dpi=dpi)     # Off-screen figure, no GUI backend involved
+        self.canvas = FigureCanvasAgg(self.fig)
+        self.ax = self.fig.add_subplot()
+        if limits is None:
+            # Same view as the live Graph: a square around starts, goals and obstacles
+            limits = Scenario("run", run.start_positions, run.goals, run.obstacles).bounds()
+        self.ax.set_xlim(limits[0], limits[1])
+        self.ax.set_ylim(limits[2], limits[3])
+        self.ax.set_aspect('equal', 'box')
+
+        base = generate_distinct_colors(run.num_agents)
+        self.colors = [base[i % len(base)] for i in range(run.num_agents)]
+        for b in run.obstacles:
+            self.ax.add_patch(patches.Rectangle((b[0], b[1]), b[2] - b[0], b[3] - b[1],
+                                                linewidth=1, edgecolor='r', facecolor='gray', alpha=0.5))
+        self.trails = LineCollection([], colors=self.colors, linewidths=1)
+        self.ax.add_collection(self.trails)
+        self.ax.scatter(run.start_positions[:, 0], run.start_positions[:, 1], marker='s', c=self.colors)
+        self.ax.scatter(run.goals[:, 0], run.goals[:, 1], marker='*', c=self.colors)
+        self.dots = self.ax.scatter(run.start_positions[:, 0], run.start_positions[:, 1], marker='o', c=self.colors, zorder=3)
+
+    # Update the artists to show the run at the given step
+    def update(self, step):
+        start = 0 if self.trail_length is None else max(0, step + 1 - self.trail_length)
+        window = np.asarray(self.run.positions[start:step + 1])
+        self.trails.set_segments(window.transpose(1, 0, 2))
+        self.dots.set_offsets(window[-1])
+
+    # Render the given step and return it as an (H, W, 3) uint8 RGB array
+    def to_array(self, step):
+        self.update(step)
+        self.canvas.draw()
+        return np.asarray(self.canvas.buffer_rgba())[:, :, :3].copy()
+
+    # Render the given step into an image file
+    def save(self, step, path):
+        self.update(step)
+        self.fig.savefig(path, dpi=self.dpi)
+
+# Steps selected for rendering: every `stride`-th recorded step, always including the last one
+def frame_steps(num_steps, stride=1):
+    steps = list(range(0, num_steps, stride))
+    if num_steps and steps[-1] != num_steps - 1:
+        steps.append(num_steps - 1)
+    return steps
+
+# Yield rendered RGB frames in order, without writing image files
+def iter_frames(run_path, stride=1, **renderer_kwargs):
+    run = TrajectoryReader(run_path)
+    renderer = FrameRenderer(run, **renderer_kwargs)
+    for step in frame_steps(run.steps, stride):
+        yield renderer.to_array(step)
+
+# Worker entry point: render one contiguous chunk of (frame number, step) pairs to PNG files whose
+# numbers are zero-padded to `digits`, so that they sort by name in frame order
+def _render_chunk(run_path, output_dir, frames, renderer_kwargs, digits=4):
+    renderer = FrameRenderer(TrajectoryReader(run_path), **renderer_kwargs)
+    for frame_number, step in frames:
+        renderer.save(step, os.path.join(output_dir, f"frame_{frame_number:0{digits}d}.png"))
+    return len(frames)
+
+# Render a recorded run to numbered PNG frames using `workers` processes; returns the frame count
+def render_run(run_path, output_dir, workers=None, stride=1, **renderer_kwargs):
+    os.makedirs(output_dir, exist_ok=True)
+    frames = list(enumerate(frame_steps(TrajectoryReader(run_path).steps, stride)))
+    digits = max(4, len(str(len(frames) - 1)))
+    workers = max(1, min(workers or os.cpu_count(), len(frames)))
+    chunks = [c.tolist() for c in np.array_split(np.array(frames, dtype=np.int64).reshape(-1, 2), workers) if len(c)]
+    if workers == 1:
+        return sum(_render_chunk(run_path, output_dir, chunk, renderer_kwargs, digits) for chunk in chunks)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_render_chunk, run_path, output_dir, chunk, renderer_kwargs, digits) for chunk in chunks]
+        return sum(f.result() for f in futures)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render frames from a recorded run")
+    parser.add_argument("path", help="Run directory written by TrajectoryWriter")
+    parser.add_argument("--output-dir", required=True, help="Folder for the numbered PNG frames")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--stride", type=int, default=1, help="Render every n-th recorded step")
+    parser.add_argument("--trail-length", type=int, default=None, help="Steps of trail to draw (default: all)")
+    parser.add_argument("--dpi", type=int, default=100)
+    args = parser.parse_args()
+
+    count = render_run(args.path, args.output_dir, workers=args.workers, stride=args.stride,
+                       trail_length=args.trail_length, dpi=args.dpi)
+    print(f"Rendered {count} frames to {args.output_dir}")
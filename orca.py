@@ -0,0 +1,238 @@
+# orca.py
+# Optimal Reciprocal Collision Avoidance (ORCA) velocity solver.
+# For each agent, every neighbor contributes a half-plane of permitted velocities (each agent takes
+# half of the responsibility for avoiding the other) and every nearby obstacle contributes a hard
+# half-plane. The new velocity is the one closest to the preferred velocity inside all half-planes
+# and the max-speed disc, found with an incremental 2D linear program; when the constraints are
+# infeasible a 3D linear program minimizes the largest violation instead. Half-plane construction
+# is vectorized over all neighbor pairs, the linear programs run per agent.
+# Run as a script with --benchmark to compare steps per second against the heuristic mode.
+
+import argparse
+import math
+import time
+import numpy as np
+from geometry import row_norms
+
+RVO_EPSILON = 1e-5  # Tolerance for parallel lines in the linear programs
+
+# A half-plane is stored as a tuple (px, py, dx, dy): a point on the boundary and a unit direction.
+# Permitted velocities v lie to the left of the direction, i.e. det(d, p - v) <= 0.
+
+def _det(ax, ay, bx, by):
+    return ax * by - ay * bx
+
+# Solve the 1D program on line line_no, subject to lines[:line_no] and the disc of given radius
+def linear_program1(lines, line_no, radius, opt_x, opt_y, direction_opt):
+    px, py, dx, dy = lines[line_no]
+    dot = px * dx + py * dy
+    discriminant = dot * dot + radius * radius - (px * px + py * py)
+    if discriminant < 0.0:
+        return None  # Max speed circle fully invalidates this line
+
+    sqrt_disc = math.sqrt(discriminant)
+    t_left = -dot - sqrt_disc
+    t_right = -dot + sqrt_disc
+
+    for i in range(line_no):
+        qx, qy, ex, ey = lines[i]
+        denominator = _det(dx, dy, ex, ey)
+        numerator = _det(ex, ey, px - qx, py - qy)
+        if abs(denominator) <= RVO_EPSILON:
+            if numerator < 0.0:
+                return None  # Lines are (almost) parallel and this one is fully invalidated
+            continue
+        t = numerator / denominator
+        if denominator >= 0.0:
+            t_right = min(t_right, t)
+        else:
+            t_left = max(t_left, t)
+        if t_left > t_right:
+            return None
+
+    if direction_opt:
+        t = t_right if opt_x * dx + opt_y * dy > 0.0 else t_left
+    else:
+        t = dx * (opt_x - px) + dy * (opt_y - py)
+        t = min(max(t, t_left), t_right)
+    return (px + t * dx, py + t * dy)
+
+# Incrementally solve the 2D program; returns (index of first failing line or len(lines), velocity)
+def linear_program2(lines, radius, opt_x, opt_y, direction_opt):
+    if direction_opt:
+        result = (opt_x * radius, opt_y * radius)  # opt is a unit direction here
+    elif opt_x * opt_x + opt_y * opt_y > radius * radius:
+        norm = math.sqrt(opt_x * opt_x + opt_y * opt_y)
+        result = (opt_x / norm * radius, opt_y / norm * radius)
+    else:
+        result = (opt_x, opt_y)
+
+    for i, (px, py, dx, dy) in enumerate(lines):
+        if _det(dx, dy, px - result[0], py - result[1]) > 0.0:
+            # Current result violates constraint i: the new optimum lies on line i
+            new_result = linear_program1(lines, i, radius, opt_x, opt_y, direction_opt)
+            if new_result is None:
+                return i, result
+            result = new_result
+    return len(lines), result
+
+# Infeasible case: minimize the maximum violation of agent lines, keeping the first num_obst_lines hard
+def linear_program3(lines, num_obst_lines, begin_line, radius, result):
+    distance = 0.0
+    for i in range(begin_line, len(lines)):
+        px, py, dx, dy = lines[i]
+        if _det(dx, dy, px - result[0], py - result[1]) > distance:
+            # Result does not satisfy constraint i: project the other lines onto it
+            proj_lines = list(lines[:num_obst_lines])
+            for j in range(num_obst_lines, i):
+                qx, qy, ex, ey = lines[j]
+                determinant = _det(dx, dy, ex, ey)
+                if abs(determinant) <= RVO_EPSILON:
+                    if dx * ex + dy * ey > 0.0:
+                        continue  # Same direction
+                    point = (0.5 * (px + qx), 0.5 * (py + qy))  # Opposite direction
+                else:
+                    s = _det(ex, ey, px - qx, py - qy) / determinant
+                    point = (px + s * dx, py + s * dy)
+                nx, ny = ex - dx, ey - dy
+                norm = math.sqrt(nx * nx + ny * ny)
+                proj_lines.append((point[0], point[1], nx / norm, ny / norm))
+
+            fail, new_result = linear_program2(proj_lines, radius, -dy, dx, True)
+            if fail >= len(proj_lines):
+                result = new_result
+            # On failure (only possible through floating-point error) keep the previous result
+            distance = _det(dx, dy, px - result[0], py - result[1])
+    return result
+
+# ORCA half-planes for ordered neighbor pairs (i, j), vectorized over all pairs. Returns (P, 4) lines.
+def agent_lines(positions, velocities, radii, i_idx, j_idx, time_step, time_horizon):
+    rel_pos = positions[j_idx] - positions[i_idx]
+    rel_vel = velocities[i_idx] - velocities[j_idx]
+    dist_sq = np.einsum("ij,ij->i", rel_pos, rel_pos)
+    combined = radii[i_idx] + radii[j_idx]
+    combined_sq = combined * combined
+    inv_tau = 1.0 / time_horizon
+
+    direction = np.zeros_like(rel_pos)
+    u = np.zeros_like(rel_pos)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # No collision yet: project on the cut-off circle or on one of the legs of the velocity obstacle
+        w = rel_vel - inv_tau * rel_pos
+        w_len_sq = np.einsum("ij,ij->i", w, w)
+        dot1 = np.einsum("ij,ij->i", w, rel_pos)
+        apart = dist_sq > combined_sq
+        cutoff = apart & (dot1 < 0.0) & (dot1 * dot1 > combined_sq * w_len_sq)
+        legs = apart & ~cutoff
+
+        w_len = np.sqrt(w_len_sq)
+        unit_w = w / w_len[:, None]
+        direction[cutoff] = np.stack([unit_w[cutoff, 1], -unit_w[cutoff, 0]], axis=1)
+        u[cutoff] = ((combined * inv_tau - w_len)[:, None] * unit_w)[cutoff]
+
+        leg = np.sqrt(np.maximum(dist_sq - combined_sq, 0.0))
+        rx, ry = rel_pos[:, 0], rel_pos[:, 1]
+        left = (rx * w[:, 1] - ry * w[:, 0]) > 0.0
+        left_dir = np.stack([rx * leg - ry * combined, rx * combined + ry * leg], axis=1) / dist_sq[:, None]
+        right_dir = -np.stack([rx * leg + ry * combined, -rx * combined + ry * leg], axis=1) / dist_sq[:, None]
+        leg_dir = np.where(left[:, None], left_dir, right_dir)
+        direction[legs] = leg_dir[legs]
+        dot2 = np.einsum("ij,ij->i", rel_vel, leg_dir)
+        u[legs] = (dot2[:, None] * leg_dir - rel_vel)[legs]
+
+        # Already colliding: resolve within one time step
+        hit = ~apart
+        w = rel_vel - (1.0 / time_step) * rel_pos
+        w_len = row_norms(w)
+        unit_w = w / w_len[:, None]
+        direction[hit] = np.stack([unit_w[hit, 1], -unit_w[hit, 0]], axis=1)
+        u[hit] = ((combined / time_step - w_len)[:, None] * unit_w)[hit]
+
+    point = velocities[i_idx] + 0.5 * u
+    lines = np.concatenate([point, direction], axis=1)
+    valid = np.isfinite(lines).all(axis=1)  # Coincident agents with identical velocities give no constraint
+    return lines, valid
+
+# Hard half-planes keeping each agent from closing the gap to nearby obstacles faster than the
+# remaining clearance allows within time_horizon_obst. Returns (i_idx, (P, 4) lines).
+def obstacle_lines(positions, radii, obstacles, max_speed, time_horizon_obst):
+    reach = time_horizon_obst * max_speed + radii.max(initial=0.0)
+    i_idx, _, rel, dist = obstacles.query_within(positions, reach)
+    keep = dist > 1e-9
+    i_idx, rel, dist = i_idx[keep], rel[keep], dist[keep]
+    normal = -rel / dist[:, None]  # Unit vector from the agent towards the closest obstacle point
+    clearance = (dist - radii[i_idx]) / time_horizon_obst
+    point = clearance[:, None] * normal
+    direction = np.stack([-normal[:, 1], normal[:, 0]], axis=1)
+    return i_idx, np.concatenate([point, direction], axis=1)
+
+# New velocities for all agents. pairs are ordered (i, j) neighbor candidates sorted by i.
+def compute_orca_velocities(positions, velocities, pref_vels, radii, max_speeds, pairs, obstacles,
+                            time_step, time_horizon, time_horizon_obst=1.0, max_neighbors=10, rng=None):
+    N = len(positions)
+    i_idx, j_idx = pairs
+    if len(i_idx):
+        # Keep the max_neighbors closest neighbors of each agent
+        rel = positions[j_idx] - positions[i_idx]
+        dist_sq = np.einsum("ij,ij->i", rel, rel)
+        order = np.lexsort((dist_sq, i_idx))
+        i_idx, j_idx = i_idx[order], j_idx[order]
+        starts = np.searchsorted(i_idx, np.arange(N))
+        rank = np.arange(len(i_idx)) - starts[i_idx]
+        keep = rank < max_neighbors
+        i_idx, j_idx = i_idx[keep], j_idx[keep]
+
+    lines, valid = agent_lines(positions, velocities, radii, i_idx, j_idx, time_step, time_horizon)
+    i_idx, lines = i_idx[valid], lines[valid]
+    agent_bounds = np.searchsorted(i_idx, np.arange(N + 1))
+    agent_lines_list = lines.tolist()
+
+    o_idx, o_lines = obstacle_lines(positions, radii, obstacles, float(max_speeds.max(initial=0.0)), time_horizon_obst)
+    obst_bounds = np.searchsorted(o_idx, np.arange(N + 1))
+    obst_lines_list = o_lines.tolist()
+
+    new_vel = np.zeros((N, 2))
+    prefs = pref_vels.tolist()
+    speeds = max_speeds.tolist()
+    for a in range(N):
+        own = agent_lines_list[agent_bounds[a]:agent_bounds[a + 1]]
+        if rng is not None and len(own) > 1:
+            own = [own[k] for k in rng.permutation(len(own))]  # Randomized insertion order
+        obst = obst_lines_list[obst_bounds[a]:obst_bounds[a + 1]]
+        lines_a = [tuple(l) for l in obst] + [tuple(l) for l in own]
+        fail, result = linear_program2(lines_a, speeds[a], prefs[a][0], prefs[a][1], False)
+        if fail < len(lines_a):
+            result = linear_program3(lines_a, len(obst), fail, speeds[a], result)
+        new_vel[a] = result
+    return new_vel
+
+# Time PyRVOController.step in heuristic and ORCA mode on random crowds of constant density
+def benchmark(agent_counts, steps=10, density=0.5, seed=0):
+    from pyrvo_adapter import PyRVOController
+    from scenario_setup import build_nodes, generate_scenario
+
+    results = []
+    for n in agent_counts:
+        crowd = generate_scenario("random_crowd", n, seed=seed, density=density)
+        for mode in ("heuristic", "orca"):
+            controller = PyRVOController(build_nodes(crowd), mode=mode)
+            start = time.perf_counter()
+            for _ in range(steps):
+                controller.step()
+            elapsed = time.perf_counter() - start
+            results.append({"agents": n, "mode": mode, "steps_per_sec": steps / elapsed})
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ORCA solver utilities")
+    parser.add_argument("--benchmark", action="store_true", help="Compare steps/sec of heuristic and ORCA modes")
+    parser.add_argument("--agents", type=int, nargs="+", default=[100, 500, 1000])
+    parser.add_argument("--steps", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.benchmark:
+        print(f"{'agents':>8} {'mode':>10} {'steps/sec':>10}")
+        for r in benchmark(args.agents, steps=args.steps):
+            print(f"{r['agents']:>8} {r['mode']:>10} {r['steps_per_sec']:>10.1f}")
+    else:
+        parser.print_help()
@@ -0,0 +1,226 @@
+# parameter_sweep.py
+# Fans headless simulations out over a process pool to sweep controller and scenario parameters.
+# Configurations come from a full parameter grid or from random (Monte Carlo) samples; every run's
+# MetricsRecorder summary is collected into a single CSV table. Failed, crashed or slow runs are
+# recorded with a status column instead of aborting the sweep.
+#
+# Example:
+#     python parameter_sweep.py --grid neighbor_dist=0.5,1.0 agents=20,40 --repeats 3 --output sweep.csv
+
+import argparse
+import csv
+import itertools
+import os
+import time
+import traceback
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+from headless_runner import run_headless
+
+# Defaults for the scenario-level keys of a configuration. Keys prefixed with "scenario_" (e.g. scenario_width)
+# go to the scenario generator; every other key goes to PyRVOController
+SIMULATION_DEFAULTS = {"scenario": "circle", "agents": 40, "steps": 1000, "seed": 0}
+
+TIMEOUT_GRACE = 10.0  # Seconds past max_wall_time before a run that has not returned is terminated
+
+# Every combination of the values in param_grid, e.g. {"agents": [20, 40], "max_speed": [0.5, 1.0]}
+def grid_configs(param_grid):
+    keys = list(param_grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(param_grid[k] for k in keys))]
+
+# num_samples random configurations; each range is (low, high) for uniform sampling or a list of choices
+def random_configs(param_ranges, num_samples, seed=0):
+    rng = np.random.default_rng(seed)
+    configs = []
+    for _ in range(num_samples):
+        config = {}
+        for key, spec in param_ranges.items():
+            if isinstance(spec, tuple):
+                low, high = spec
+                if isinstance(low, int) and isinstance(high, int):
+                    config[key] = int(rng.integers(low, high + 1))
+                else:
+                    config[key] = float(rng.uniform(low, high))
+            else:
+                config[key] = spec[int(rng.integers(len(spec)))]
+        configs.append(config)
+    return configs
+
+# Repeat each configuration with consecutive seeds (Monte Carlo replicas), starting from its own seed
+def with_repeats(configs, repeats, base_seed=0):
+    return [dict(config, seed=config.get("seed", base_seed) + r) for config in configs for r in range(repeats)]
+
+# Parameter columns of a result row. The step limit is stored as max_steps, since the summary's "steps"
+# column is the number of steps actually run
+def config_row(config):
+    row = dict(SIMULATION_DEFAULTS, **config)
+    row["max_steps"] = row.pop("steps")
+    return row
+
+# Worker entry point: run one configuration and return a flat result row (never raises)
+def run_config(config, max_wall_time=None):
+    params = dict(SIMULATION_DEFAULTS, **config)
+    scenario_params = {k[len("scenario_"):]: v for k, v in params.items() if k.startswith("scenario_")}
+    controller_kwargs = {k: v for k, v in params.items() if k not in SIMULATION_DEFAULTS and not k.startswith("scenario_")}
+    row = config_row(config)
+    start = time.perf_counter()
+    try:
+        summary = run_headless(params["scenario"], params["agents"], params["steps"], seed=params["seed"],
+                               max_wall_time=max_wall_time, scenario_params=scenario_params, **controller_kwargs)
+        row.update(summary)
+        cut_short = summary["steps"] < params["steps"] and not summary["all_goals_reached"]
+        row["status"] = "timeout" if cut_short else "ok"
+        row["error"] = ""
+    except Exception as e:
+        row["status"] = "error"
+        row["error"] = "".join(traceback.format_exception_only(type(e), e)).strip()
+    row["elapsed_sec"] = time.perf_counter() - start
+    return row
+
+# Stop a pool at once, killing its worker processes (a running task cannot be cancelled otherwise)
+def _terminate_pool(pool):
+    for process in list((pool._processes or {}).values()):
+        process.terminate()
+    pool.shutdown(wait=True, cancel_futures=True)
+
+# Run all configurations on a process pool and write one CSV row per run to output_path.
+# At most max_workers runs are in flight, so every submitted run is actually executing. When a worker
+# process dies (e.g. out of memory), the pool is replaced and only the run that crashed is recorded as
+# "crashed": if several runs were in flight, each of them is retried alone until the crash is attributed.
+# max_wall_time is checked between simulation steps and keeps the partial metrics; run_timeout (default:
+# max_wall_time plus TIMEOUT_GRACE) is enforced here, so runs stuck in scenario generation or in a single
+# step are recorded as "timeout" too. Their pool is terminated and the other runs in flight are resubmitted.
+def run_sweep(configs, output_path, max_workers=None, max_wall_time=None, run_timeout=None):
+    max_workers = max_workers or os.cpu_count()
+    if run_timeout is None and max_wall_time is not None:
+        run_timeout = max_wall_time + TIMEOUT_GRACE
+    rows = [None] * len(configs)
+    pending = deque(range(len(configs)))          # Run ids not yet submitted
+    suspects = deque()                            # Runs in flight during a crash, retried one at a time
+    running = {}                                  # Future -> (run id, submit time)
+    solo = None                                   # Suspect currently being retried alone
+    pool = ProcessPoolExecutor(max_workers=max_workers)
+
+    def submit(run_id):
+        running[pool.submit(run_config, configs[run_id], max_wall_time)] = (run_id, time.perf_counter())
+
+    def record(run_id, row):
+        rows[run_id] = dict(run_id=run_id, **row)
+        print(f"[{sum(r is not None for r in rows)}/{len(rows)}] run {run_id}: {row['status']}")
+
+    try:
+        while pending or suspects or running:
+            if not running:
+                solo = suspects.popleft() if suspects else None  # Suspects are retried alone
+                if solo is not None:
+                    submit(solo)
+            if solo is None:
+                while pending and len(running) < max_workers:
+                    submit(pending.popleft())
+            in_flight = len(running)
+            timeout = None
+            if run_timeout is not None:
+                first_start = min(started for _, started in running.values())
+                timeout = max(0.0, first_start + run_timeout - time.perf_counter())
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+            broken = []
+            for future in done:
+                run_id, _ = running.pop(future)
+                try:
+                    record(run_id, future.result())
+                except BrokenProcessPool:
+                    broken.append(run_id)
+                except Exception as e:
+                    record(run_id, dict(config_row(configs[run_id]), status="error", error=str(e)))
+
+            if broken:
+                # A worker died and the pool is unusable: every run still in flight failed with it
+                broken.extend(run_id for run_id, _ in running.values())
+                running.clear()
+                if in_flight == 1:
+                    record(broken[0], dict(config_row(configs[broken[0]]), status="crashed",
+                                           error="Worker process terminated abruptly"))
+                else:
+                    suspects.extend(sorted(broken))
+                pool.shutdown(wait=True)
+                pool = ProcessPoolExecutor(max_workers=max_workers)
+            elif run_timeout is not None:
+                now = time.perf_counter()
+                expired = [f for f, (_, started) in running.items() if now - started >= run_timeout]
+                if expired:
+                    for future in expired:
+                        run_id, started = running.pop(future)
+                        record(run_id, dict(config_row(configs[run_id]), status="timeout",
+                                            error=f"No result after {run_timeout:.1f} s; worker terminated",
+                                            elapsed_sec=now - started))
+                    # Runs interrupted by the termination did nothing wrong: run them again first
+                    for run_id, _ in sorted(running.values(), reverse=True):
+                        pending.appendleft(run_id)
+                    running.clear()
+                    _terminate_pool(pool)
+                    pool = ProcessPoolExecutor(max_workers=max_workers)
+    finally:
+        if running:
+            _terminate_pool(pool)
+        else:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    write_rows(rows, output_path)
+    return rows
+
+# Write result rows to CSV; the header is the union of all row keys in first-seen order
+def write_rows(rows, output_path):
+    columns = []
+    for row in rows:
+        columns.extend(k for k in row if k not in columns)
+    with open(output_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+# Parse a command-line value as int, float or string
+def _parse_value(text):
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    return text
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parameter sweep over headless RVO simulations")
+    parser.add_argument("--grid", nargs="*", default=[], metavar="KEY=V1,V2",
+                        help="Grid axes, e.g. neighbor_dist=0.5,1.0 agents=20,40")
+    parser.add_argument("--range", nargs="*", default=[], metavar="KEY=LOW:HIGH",
+                        help="Random-sample ranges, e.g. max_speed=0.5:1.5 (used with --samples)")
+    parser.add_argument("--samples", type=int, default=0, help="Number of random configurations to draw")
+    parser.add_argument("--repeats", type=int, default=1, help="Seeds per configuration")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--max-wall-time", type=float, default=None, help="Per-run time limit in seconds")
+    parser.add_argument("--run-timeout", type=float, default=None,
+                        help="Hard per-run limit in seconds; the worker is terminated (default: max wall time + 10)")
+    parser.add_argument("--output", default="sweep_results.csv")
+    args = parser.parse_args()
+
+    grid = {}
+    for item in args.grid:
+        key, values = item.split("=", 1)
+        grid[key] = [_parse_value(v) for v in values.split(",")]
+    configs = grid_configs(grid)
+
+    if args.samples:
+        ranges = {}
+        for item in args.range:
+            key, bounds = item.split("=", 1)
+            low, high = bounds.split(":")
+            ranges[key] = (_parse_value(low), _parse_value(high))
+        samples = random_configs(ranges, args.samples)
+        configs = [dict(g, **s) for g in configs for s in samples]
+
+    configs = with_repeats(configs, args.repeats)
+    print(f"Running {len(configs)} simulations...")
+    run_sweep(configs, args.output, max_workers=args.workers, max_wall_time=args.max_wall_time,
+              run_timeout=args.run_timeout)
+    print(f"Results written to {args.output}")
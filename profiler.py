@@ -0,0 +1,191 @@
+# profiler.py
+# Low-overhead per-phase instrumentation for the simulation loop.
+# Instrumented code opens a section per call (e.g. one controller step), marks the end of each phase
+# with lap() and adds counters with count(). When a section ends its phase times and counters are
+# accumulated, passed to registered callbacks and, if tracing, stored as trace events that can be
+# opened in chrome://tracing or Perfetto. Components default to NULL_PROFILER, whose methods do
+# nothing, so disabled instrumentation costs a few no-op method calls per section.
+#
+# Example:
+#     prof = Profiler(trace=True)
+#     controller = PyRVOController(nodes, profiler=prof)
+#     ...
+#     prof.print_summary()
+#     prof.write_trace("trace.json")
+
+import json
+import threading
+import time
+
+class Section:
+    # One timed call of an instrumented section (e.g. a single controller step)
+    __slots__ = ("profiler", "name", "start", "last", "phases", "counters", "events")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler                  # Owning Profiler
+        self.name = name                          # Section name, e.g. "controller"
+        self.start = self.last = time.perf_counter()
+        self.phases = {}                          # Phase name -> seconds spent in this call
+        self.counters = {}                        # Counter name -> count for this call
+        self.events = [] if profiler.trace is not None else None  # (phase, start, duration) when tracing
+
+    # Attribute the time since the previous lap (or the section start) to `phase`
+    def lap(self, phase):
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + (now - self.last)
+        if self.events is not None:
+            self.events.append((phase, self.last, now - self.last))
+        self.last = now
+
+    # Add n to a counter for this call
+    def count(self, counter, n=1):
+        self.counters[counter] = self.counters.get(counter, 0) + n
+
+    # Close the section and report it to the profiler
+    def end(self):
+        self.profiler._finish(self, time.perf_counter())
+
+class _NullSection:
+    # Section used when profiling is disabled: every method is a no-op
+    __slots__ = ()
+
+    def lap(self, phase):
+        pass
+
+    def count(self, counter, n=1):
+        pass
+
+    def end(self):
+        pass
+
+class NullProfiler:
+    # Disabled profiler; components use it by default
+    enabled = False
+
+    def begin(self, name):
+        return NULL_SECTION
+
+NULL_SECTION = _NullSection()
+NULL_PROFILER = NullProfiler()
+
+class Profiler:
+    enabled = True
+
+    def __init__(self, trace=False, max_trace_events=1000000):
+        # Accumulate per-section phase timers and counters; with trace=True also keep individual events
+        self.sections = {}                        # Section name -> {"calls", "total_sec", "max_sec"}
+        self.phases = {}                          # (section, phase) -> {"calls", "total_sec", "max_sec"}
+        self.counters = {}                        # (section, counter) -> total count
+        self.callbacks = []                       # Functions called with a record dict after each section
+        self.trace = [] if trace else None        # Chrome trace events, if tracing
+        self.max_trace_events = max_trace_events  # Tracing stops once this many events are stored
+        self.origin = time.perf_counter()         # Time origin of trace timestamps
+        self._lock = threading.Lock()             # Sections may end on different threads (e.g. rendering)
+
+    # Start timing a call of the named section
+    def begin(self, name):
+        return Section(self, name)
+
+    # Register fn(record) to be called after every section, where record holds "section", "call",
+    # "duration_sec", "phases" and "counters" for that call
+    def add_callback(self, fn):
+        self.callbacks.append(fn)
+        return fn
+
+    def remove_callback(self, fn):
+        self.callbacks.remove(fn)
+
+    def _finish(self, section, now):
+        duration = now - section.start
+        with self._lock:
+            stats = self.sections.setdefault(section.name, {"calls": 0, "total_sec": 0.0, "max_sec": 0.0})
+            stats["calls"] += 1
+            stats["total_sec"] += duration
+            stats["max_sec"] = max(stats["max_sec"], duration)
+            for phase, elapsed in section.phases.items():
+                p = self.phases.setdefault((section.name, phase), {"calls": 0, "total_sec": 0.0, "max_sec": 0.0})
+                p["calls"] += 1
+                p["total_sec"] += elapsed
+                p["max_sec"] = max(p["max_sec"], elapsed)
+            for counter, n in section.counters.items():
+                key = (section.name, counter)
+                self.counters[key] = self.counters.get(key, 0) + n
+            if self.trace is not None and len(self.trace) < self.max_trace_events:
+                self._add_trace_events(section, duration)
+            call = stats["calls"]
+        if self.callbacks:
+            record = {"section": section.name, "call": call, "duration_sec": duration,
+                      "phases": section.phases, "counters": section.counters}
+            for fn in self.callbacks:
+                fn(record)
+
+    def _add_trace_events(self, section, duration):
+        # Complete ("X") events in microseconds: one for the section, one per phase, plus a counter event
+        tid = threading.get_ident()
+        us = lambda t: 1e6 * (t - self.origin)
+        self.trace.append({"name": section.name, "cat": "section", "ph": "X", "ts": us(section.start),
+                           "dur": 1e6 * duration, "pid": 0, "tid": tid})
+        for phase, start, elapsed in section.events:
+            self.trace.append({"name": phase, "cat": section.name, "ph": "X", "ts": us(start),
+                               "dur": 1e6 * elapsed, "pid": 0, "tid": tid})
+        if section.counters:
+            self.trace.append({"name": f"{section.name} counters", "ph": "C", "ts": us(section.start),
+                               "pid": 0, "tid": tid, "args": dict(section.counters)})
+
+    # Clear all accumulated data (callbacks stay registered)
+    def reset(self):
+        with self._lock:
+            self.sections.clear()
+            self.phases.clear()
+            self.counters.clear()
+            if self.trace is not None:
+                self.trace = []
+            self.origin = time.perf_counter()
+
+    # Nested summary: per section its call count, times, phase breakdown and counters (total and per call)
+    def summary(self):
+        with self._lock:
+            result = {}
+            for name, stats in self.sections.items():
+                calls = stats["calls"]
+                result[name] = {
+                    "calls": calls,
+                    "total_sec": stats["total_sec"],
+                    "mean_sec": stats["total_sec"] / calls,
+                    "max_sec": stats["max_sec"],
+                    "phases": {},
+                    "counters": {},
+                }
+            for (name, phase), p in self.phases.items():
+                result[name]["phases"][phase] = {
+                    "total_sec": p["total_sec"],
+                    "mean_sec": p["total_sec"] / result[name]["calls"],
+                    "max_sec": p["max_sec"],
+                    "share": p["total_sec"] / self.sections[name]["total_sec"] if self.sections[name]["total_sec"] > 0 else 0.0,
+                }
+            for (name, counter), n in self.counters.items():
+                result[name]["counters"][counter] = {"total": n, "per_call": n / result[name]["calls"]}
+            return result
+
+    def print_summary(self):
+        print("\n===== PROFILE =====")
+        for name, s in self.summary().items():
+            print(f"{name}: {s['calls']} calls, {1e3 * s['mean_sec']:.3f} ms/call (max {1e3 * s['max_sec']:.3f} ms)")
+            for phase, p in s["phases"].items():
+                print(f"    {phase:<22} {1e3 * p['mean_sec']:9.3f} ms/call  {100 * p['share']:5.1f}%")
+            for counter, c in s["counters"].items():
+                print(f"    {counter:<22} {c['per_call']:9.1f} /call")
+
+    # Write the summary as JSON
+    def write_summary(self, path):
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+
+    # Write the trace in Chrome trace event format (requires trace=True)
+    def write_trace(self, path):
+        if self.trace is None:
+            raise ValueError("Profiler was created without trace=True")
+        with self._lock:
+            events = list(self.trace)
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
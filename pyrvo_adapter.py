@@ -3,33 +3,80 @@
 # It defines agent behavior, computes repulsion from other agents and obstacles, and updates agent velocities
 # in a decentralized multi-agent navigation system.
 
+import json
+import time
 import numpy as np
+from agent_store import AgentStore, AgentHandle
+from geometry import row_norms
+from neighbor_index import make_neighbor_index
+from obstacles import ObstacleSet
+from orca import compute_orca_velocities
+from profiler import NULL_PROFILER, NULL_SECTION
 
-class PyRVOAgent:
-    def __init__(self, uid, position, goal, radius=0.1, max_speed=1.0):
-        # Initialize an RVO agent with a unique ID, position, goal, radius, and speed limit
-        self.uid = uid                            # Unique identifier of the agent
-        self.position = np.array(position)        # Current 2D position
-        self.velocity = np.zeros(2)               # Current 2D velocity
-        self.goal = np.array(goal)                # Goal 2D position
-        self.radius = radius                      # Agent radius (for local interaction)
-        self.max_speed = max_speed                # Maximum movement speed
+# Per-agent handle onto the controller's AgentStore (kept under its original name)
+PyRVOAgent = AgentHandle
 
 class PyRVOController:
-    def __init__(self, agents, time_step=0.05, neighbor_dist=1.0, time_horizon=3.0, graph=None, num_fallback_samples=60, max_speed=1.0):
-        # Controller for updating agent velocities using simplified RVO logic
+    def __init__(self, agents, time_step=0.05, neighbor_dist=1.0, time_horizon=3.0, graph=None, num_fallback_samples=60, max_speed=1.0,
+                 engine="vectorized", neighbor_index="grid", obstacles=None, fallback_coarse_samples=None, fallback_refine_samples=8,
+                 mode="heuristic", time_horizon_obst=1.0, max_neighbors=10, agent_radius=0.1, seed=0, bind_nodes=True,
+                 profiler=None):
+        # Controller for updating agent velocities using simplified RVO logic (mode="heuristic")
+        # or ORCA half-planes solved by linear programming (mode="orca")
+        if mode not in ("heuristic", "orca"):
+            raise ValueError(f"Unknown mode: {mode}")
+        self.mode = mode                                # "heuristic" repulsion or "orca" velocity obstacles
         self.time_step = time_step                      # Time step for integration
         self.neighbor_dist = neighbor_dist              # Interaction range for agent-agent repulsion
-        self.time_horizon = time_horizon                # (Not used here) placeholder for time horizon in planning
+        self.time_horizon = time_horizon                # ORCA look-ahead time for agent-agent constraints
+        self.time_horizon_obst = time_horizon_obst      # ORCA look-ahead time for obstacle constraints
+        self.max_neighbors = max_neighbors              # ORCA: closest neighbors considered per agent
+        self.rng = np.random.default_rng(seed)          # ORCA: randomized constraint insertion order
         self.num_fallback_samples = num_fallback_samples # Samples used when fallback velocities are needed
-        self.agents = [PyRVOAgent(a.uid, a.state[:2], a.goal) for a in agents]  # Internal agent state
-        self.uid_to_agent = {a.uid: a for a in self.agents}  # Map from UID to agent object
-        self.obstacles = graph.obstacles if graph is not None else []  # Axis-aligned rectangular obstacles
+        self.fallback_coarse_samples = fallback_coarse_samples  # If set, coarse sample count before local refinement
+        self.fallback_refine_samples = fallback_refine_samples  # Extra samples around the best coarse direction
+        self.agent_radius = agent_radius                # Default radius of newly added agents
+        self.store = AgentStore(capacity=len(agents))   # Structure-of-arrays agent state
+        for node in agents:
+            self.add_agent(node, bind=bind_nodes)
+        if obstacles is None:
+            obstacles = graph.obstacles if graph is not None else []
+        self.obstacles = obstacles if isinstance(obstacles, ObstacleSet) else ObstacleSet(obstacles)  # Axis-aligned rectangles
         self.max_speed = max_speed                      # Max speed for all agents
+        self.fallback_angles = np.linspace(0, 2 * np.pi, num_fallback_samples, endpoint=False)  # Precomputed sample directions
+        self.fallback_velocities = max_speed * np.stack([np.cos(self.fallback_angles), np.sin(self.fallback_angles)], axis=1)
+        if fallback_coarse_samples:
+            self.coarse_angles = np.linspace(0, 2 * np.pi, fallback_coarse_samples, endpoint=False)
+            self.coarse_velocities = max_speed * np.stack([np.cos(self.coarse_angles), np.sin(self.coarse_angles)], axis=1)
+        if engine not in ("vectorized", "scalar"):
+            raise ValueError(f"Unknown engine: {engine}")
+        self.engine = engine                            # "vectorized" (batched arrays) or "scalar" (per-agent loop)
+        self.neighbor_index = make_neighbor_index(neighbor_index, cell_size=neighbor_dist)  # Candidate search for the vectorized engine
+        self.last_step_time = 0.0                       # Wall-clock duration of the most recent step() call
+        self.profiler = profiler or NULL_PROFILER       # Per-phase timers and counters (profiler.Profiler), off by default
+        self.obstacle_checks = 0                        # Total points tested against obstacles
 
     def step(self):
-        # Compute the next velocity for each agent based on repulsion and obstacle avoidance
+        # Advance all agents by one time step using the selected engine
+        start_time = time.perf_counter()
+        prof = self.profiler.begin("controller")
+        checks = self.obstacle_checks
+        if self.mode == "orca":
+            self.step_orca(prof)
+        elif self.engine == "scalar":
+            self.step_scalar(prof)
+        else:
+            self.step_vectorized(prof)
+        prof.count("obstacle_checks", self.obstacle_checks - checks)
+        prof.end()
+        self.last_step_time = time.perf_counter() - start_time
+
+    def step_scalar(self, prof=NULL_SECTION):
+        # Reference per-agent implementation, kept for cross-checking the vectorized engine
+        # Compute the next velocity for each agent based on repulsion and obstacle avoidance.
+        # prof is the profiler section of the current step (phases are attributed per agent).
         for a in self.agents:
+            prof.lap("other")
             pref_vel = a.goal - a.position  # Vector to goal
             if np.linalg.norm(pref_vel) > 1e-6:
                 pref_vel = a.max_speed * pref_vel / np.linalg.norm(pref_vel)
@@ -51,6 +98,8 @@ class PyRVOController:
                     avoid_dir = -rel_pos / dist
                     strength = (combined_radius - dist) / combined_radius
                     new_vel += 1.2 * strength * avoid_dir  # Apply repulsion
+            prof.lap("neighbor_repulsion")
+            prof.count("neighbor_pairs", len(self.agents) - 1)
 
             # === Soft repulsion from obstacles ===
             for (min_xy, max_xy) in self.obstacles:
@@ -61,11 +110,14 @@ class PyRVOController:
                     avoid_dir = rel / dist
                     strength = (1.0 - dist)
                     new_vel += 1.2 * strength * avoid_dir
+            prof.lap("obstacle_repulsion")
 
             # === Obstacle entry prediction and fallback velocity ===
             next_pos = a.position + self.time_step * new_vel
             if self.is_in_obstacle(next_pos):
                 new_vel = self.find_fallback_velocity(a, pref_vel)
+                prof.count("fallback_invocations")
+            prof.lap("fallback")
 
             # === Speed limiting ===
             speed = np.linalg.norm(new_vel)
@@ -73,21 +125,152 @@ class PyRVOController:
                 new_vel = a.max_speed * new_vel / speed
 
             a.velocity = new_vel
+        prof.lap("other")
 
         # === Apply the velocity to update agent position ===
         for a in self.agents:
             proposed_pos = a.position + self.time_step * a.velocity
             if not self.is_in_obstacle(proposed_pos):
                 a.position = proposed_pos
+        prof.lap("integration")
+
+    def step_vectorized(self, prof=NULL_SECTION):
+        # Batched implementation of step_scalar operating on contiguous (N, 2) arrays.
+        # Contributions are accumulated per agent in the same order as the scalar loop
+        # (other agents by index, then obstacles), so both engines produce identical results.
+        positions, goals, velocities, radii, max_speeds = self.gather_state()
+        if len(positions) == 0:
+            return
+        new_vel = self.heuristic_velocities(positions, goals, max_speeds, prof=prof)
+
+        # === Apply the velocity to update agent position ===
+        self.integrate(positions, new_vel)
+        prof.lap("integration")
+
+    def heuristic_velocities(self, positions, goals, max_speeds, active=None, prof=NULL_SECTION):
+        # New velocities of the heuristic model for agents at (N, 2) positions. With a boolean `active`
+        # mask only those rows get a velocity (an (A, 2) array is returned) and the others act only as
+        # neighbors, e.g. the halo agents of a spatial shard.
+        if active is None:
+            own_pos, own_goals, own_max_speeds, to_row = positions, goals, max_speeds, None
+        else:
+            own_pos, own_goals, own_max_speeds = positions[active], goals[active], max_speeds[active]
+            to_row = np.cumsum(active) - 1  # Row in the active subset of each active agent
+
+        # === Preferred velocities towards goals ===
+        pref_vel = self.preferred_velocities(own_pos, own_goals, own_max_speeds)
+
+        new_vel = pref_vel.copy()
+        prof.lap("other")
+
+        # === Agent-to-agent repulsion ===
+        i_idx, j_idx = self.candidate_pairs(positions)
+        if to_row is not None:
+            keep = active[i_idx]
+            i_idx, j_idx = i_idx[keep], j_idx[keep]
+        prof.lap("neighbor_search")
+        prof.count("neighbor_pairs", len(i_idx))
+        rel_pos = positions[j_idx] - positions[i_idx]
+        dist = row_norms(rel_pos)
+        keep = (dist >= 1e-6) & (dist < self.neighbor_dist)
+        i_idx, rel_pos, dist = i_idx[keep], rel_pos[keep], dist[keep]
+        if to_row is not None:
+            i_idx = to_row[i_idx]
+        combined_radius = self.neighbor_dist
+        avoid_dir = -rel_pos / dist[:, None]
+        strength = (combined_radius - dist) / combined_radius
+        np.add.at(new_vel, i_idx, 1.2 * strength[:, None] * avoid_dir)
+        prof.lap("neighbor_repulsion")
+
+        # === Soft repulsion from obstacles ===
+        i_idx, _, rel, d = self.obstacles.query_within(own_pos, 1.0)
+        prof.count("obstacle_pairs", len(i_idx))
+        keep = d > 1e-6
+        i_idx, rel, d = i_idx[keep], rel[keep], d[keep]
+        avoid_dir = rel / d[:, None]
+        strength = (1.0 - d)
+        np.add.at(new_vel, i_idx, 1.2 * strength[:, None] * avoid_dir)
+        prof.lap("obstacle_repulsion")
+
+        # === Obstacle entry prediction and fallback velocity ===
+        next_pos = own_pos + self.time_step * new_vel
+        stuck = self.points_in_obstacles(next_pos)
+        if stuck.any():
+            new_vel[stuck] = self.find_fallback_velocities(own_pos[stuck], pref_vel[stuck])
+            prof.count("fallback_invocations", int(np.count_nonzero(stuck)))
+        prof.lap("fallback")
+
+        # === Speed limiting ===
+        speed = row_norms(new_vel)
+        fast = speed > own_max_speeds
+        new_vel[fast] = own_max_speeds[fast, None] * new_vel[fast] / speed[fast, None]
+        prof.lap("other")
+        return new_vel
+
+    def step_orca(self, prof=NULL_SECTION):
+        # ORCA mode: new velocities from per-agent half-plane linear programs, then the same integration
+        positions, goals, velocities, radii, max_speeds = self.gather_state()
+        if len(positions) == 0:
+            return
+        pref_vel = self.preferred_velocities(positions, goals, max_speeds)
+        prof.lap("other")
+        pairs = self.candidate_pairs(positions)
+        prof.lap("neighbor_search")
+        prof.count("neighbor_pairs", len(pairs[0]))
+        new_vel = compute_orca_velocities(positions, velocities, pref_vel, radii, max_speeds,
+                                          pairs, self.obstacles,
+                                          self.time_step, self.time_horizon, self.time_horizon_obst,
+                                          self.max_neighbors, self.rng)
+        prof.lap("orca_solve")
+        self.integrate(positions, new_vel)
+        prof.lap("integration")
+
+    def preferred_velocities(self, positions, goals, max_speeds):
+        # Full-speed unit direction towards each goal, zero for agents already at their goal
+        pref_vel = goals - positions
+        pref_norm = row_norms(pref_vel)
+        moving = pref_norm > 1e-6
+        pref_vel[moving] = max_speeds[moving, None] * pref_vel[moving] / pref_norm[moving, None]
+        pref_vel[~moving] = 0.0
+        return pref_vel
+
+    def integrate(self, positions, velocities):
+        # Move every agent whose next position is obstacle-free and store the new state
+        self.scatter_state(self.advance(positions, velocities), velocities)
+
+    def advance(self, positions, velocities):
+        # Positions after one time step; agents whose next position lies inside an obstacle stay in place
+        proposed_pos = positions + self.time_step * velocities
+        blocked = self.points_in_obstacles(proposed_pos)
+        proposed_pos[blocked] = positions[blocked]
+        return proposed_pos
+
+    def gather_state(self):
+        # Views of the packed agent state: positions, goals, velocities (N, 2); radii, max speeds (N,)
+        store = self.store
+        return store.positions, store.goals, store.velocities, store.radii, store.max_speeds
+
+    def scatter_state(self, positions, velocities):
+        # Store batched positions and velocities (a no-op copy when given the store's own views)
+        self.store.positions[...] = positions
+        self.store.velocities[...] = velocities
+
+    def candidate_pairs(self, positions):
+        # Ordered (i, j) index pairs, i != j, that may lie within neighbor_dist, sorted by i then j
+        self.neighbor_index.build(positions)
+        return self.neighbor_index.query_pairs(self.neighbor_dist)
+
+    def points_in_obstacles(self, points):
+        # Batched is_in_obstacle: boolean mask of which (P, 2) points lie inside any rectangle
+        self.obstacle_checks += len(points)
+        return self.obstacles.contains(points)
 
     def find_fallback_velocity(self, agent, pref_vel):
         # Sample fallback velocities when preferred direction leads to obstacle collision
         best_vel = np.zeros(2)
         best_cost = float("inf")
-        angles = np.linspace(0, 2 * np.pi, self.num_fallback_samples, endpoint=False)
 
-        for angle in angles:
-            v = self.max_speed * np.array([np.cos(angle), np.sin(angle)])
+        for v in self.fallback_velocities:
             next_pos = agent.position + self.time_step * v
             if self.is_in_obstacle(next_pos):
                 continue
@@ -98,20 +281,97 @@ class PyRVOController:
 
         return best_vel
 
+    def find_fallback_velocities(self, positions, pref_vels):
+        # Batched find_fallback_velocity for K stuck agents: evaluates all (agents x samples) candidates at once.
+        # With fallback_coarse_samples set, a coarse pass is refined locally around each agent's best direction.
+        if not self.fallback_coarse_samples:
+            best_vel, _ = self._best_fallback(positions, pref_vels, self.fallback_velocities[None])
+            return best_vel
+
+        best_vel, best_cost = self._best_fallback(positions, pref_vels, self.coarse_velocities[None])
+        found = np.isfinite(best_cost)
+        if found.any():
+            spacing = 2 * np.pi / self.fallback_coarse_samples
+            best_angle = np.arctan2(best_vel[found, 1], best_vel[found, 0])
+            offsets = np.linspace(-spacing, spacing, self.fallback_refine_samples + 2)[1:-1]
+            angles = best_angle[:, None] + offsets[None, :]
+            candidates = self.max_speed * np.stack([np.cos(angles), np.sin(angles)], axis=2)
+            refined_vel, refined_cost = self._best_fallback(positions[found], pref_vels[found], candidates)
+            better = refined_cost < best_cost[found]
+            best_vel[np.nonzero(found)[0][better]] = refined_vel[better]
+        if not found.all():
+            # Coarse pass found nothing: retry the blocked agents with the full sample set
+            best_vel[~found], _ = self._best_fallback(positions[~found], pref_vels[~found], self.fallback_velocities[None])
+        return best_vel
+
+    def _best_fallback(self, positions, pref_vels, candidates):
+        # Lowest-cost obstacle-free candidate per agent; candidates is (1 or K, S, 2).
+        # Returns (K, 2) velocities and (K,) costs, with zero velocity and infinite cost when all are blocked.
+        K = len(positions)
+        candidates = np.broadcast_to(candidates, (K,) + candidates.shape[1:])
+        next_pos = positions[:, None, :] + self.time_step * candidates
+        blocked = self.points_in_obstacles(next_pos.reshape(-1, 2)).reshape(K, -1)
+        cost = row_norms(candidates - pref_vels[:, None, :])
+        cost[blocked] = np.inf
+        best = np.argmin(cost, axis=1)
+        rows = np.arange(K)
+        best_cost = cost[rows, best]
+        best_vel = np.where(np.isfinite(best_cost)[:, None], candidates[rows, best], 0.0)
+        return best_vel, best_cost
+
     def is_in_obstacle(self, pos):
         # Check if a given position lies within any rectangular obstacle
-        for (min_xy, max_xy) in self.obstacles:
-            if all(min_xy[i] <= pos[i] <= max_xy[i] for i in range(2)):
-                return True
-        return False
+        self.obstacle_checks += 1
+        return bool(self.obstacles.contains(pos)[0])
 
     def get_velocity(self, uid):
         # Retrieve current velocity for a specific agent by UID
-        return self.uid_to_agent[uid].velocity
+        return self.store.velocity[self.store.index_of[uid]].copy()
 
     def update_from_nodes(self, nodes):
-        # Synchronize internal agent positions and goals from external simulation nodes
+        # Synchronize internal agent positions and goals from external simulation nodes.
+        # Nodes bound to the agent store already share its memory and are skipped.
+        store = self.store
         for node in nodes:
-            a = self.uid_to_agent[node.uid]
-            a.position = node.state[:2].copy()
-            a.goal = node.goal.copy()
+            if store.nodes.get(node.uid) is node and store.is_bound(node):
+                continue
+            row = store.index_of[node.uid]
+            store.state[row, :2] = node.state[:2]
+            store.goal[row] = node.goal
+
+    def add_agent(self, node, radius=None, max_speed=1.0, bind=True):
+        # Add an agent from a node (uid, state, goal); with bind=True the node's state and goal become
+        # views of the agent store so that no per-step synchronization is needed
+        state = np.asarray(node.state, dtype=float)
+        theta = state[2] if len(state) > 2 else 0.0
+        handle = self.store.add(node.uid, state[:2], node.goal, radius=self.agent_radius if radius is None else radius,
+                                max_speed=max_speed, theta=theta)
+        if bind and len(state) == 3:
+            self.store.bind_node(node)
+        return handle
+
+    def remove_agent(self, uid):
+        # Remove an agent mid-run; a bound node keeps a private copy of its last state
+        self.store.remove(uid)
+
+    def snapshot(self):
+        # Mutable controller state for checkpoints: agent rows, obstacles and the ORCA random generator
+        return {"agents": self.store.snapshot(), "obstacles": self.obstacles.boxes.copy(),
+                "rng_state": json.dumps(self.rng.bit_generator.state), "obstacle_checks": self.obstacle_checks}
+
+    def restore(self, snapshot):
+        # Restore state saved by snapshot(); agents are added or removed to match the snapshot
+        self.store.restore(snapshot["agents"])
+        self.obstacles = ObstacleSet(np.asarray(snapshot["obstacles"], dtype=float).reshape(-1, 4))
+        self.rng.bit_generator.state = json.loads(str(snapshot["rng_state"]))
+        self.obstacle_checks = int(snapshot["obstacle_checks"])
+
+    @property
+    def agents(self):
+        # Agent handles in store order
+        return self.store.handles
+
+    @property
+    def uid_to_agent(self):
+        # Map from UID to agent handle
+        return {a.uid: a for a in self.store.handles}
@@ -1,25 +1,273 @@
 # scenario_setup.py
-# Provides helper function to configure initial positions and goals for agents
-# based on predefined scenario types (e.g., circle, circle with obstacles).
+# Scenario library: generates initial positions, goals and rectangular obstacles for agents.
+# Families include circles (with and without obstacles), bidirectional corridors, crossing flows,
+# random dense fields, uniform random crowds, grids and mazes. Generation is vectorized and
+# deterministic per seed, and load_scenario caches generated scenarios on disk so that large setups
+# are only built once. build_nodes turns a scenario into agent nodes.
+# setup_scenario and setup_obstacles keep the original list-based interface.
 
+import hashlib
+import json
+import os
+import tempfile
 import numpy as np
 
-# Generate initial positions and goal destinations for a given scenario type
-def setup_scenario(scenario_type, num_agents):
-    agents_info = []  # List of (initial_position, goal_position) pairs for all agents
+SCENARIO_CACHE_VERSION = 1  # Bump when a generator changes, to invalidate cached scenarios
+
+class Scenario:
+    def __init__(self, name, positions, goals, obstacles=None, params=None):
+        # A generated scenario: agents and obstacles defined together
+        self.name = name                                    # Scenario family name
+        self.positions = np.asarray(positions, dtype=float).reshape(-1, 2)  # (N, 2) initial positions
+        self.goals = np.asarray(goals, dtype=float).reshape(-1, 2)          # (N, 2) goal positions
+        obstacles = np.zeros((0, 4)) if obstacles is None else obstacles
+        self.obstacles = np.asarray(obstacles, dtype=float).reshape(-1, 4)  # (M, 4) [min_x, min_y, max_x, max_y]
+        self.params = dict(params or {})                    # Generator parameters, including seed
+
+    @property
+    def num_agents(self):
+        return len(self.positions)
+
+    # List of (initial_position, goal_position) pairs, as returned by setup_scenario
+    def agents_info(self):
+        return list(zip(self.positions, self.goals))
+
+    # Obstacles as a list of (min_xy, max_xy) corner pairs
+    def obstacle_list(self):
+        return [((b[0], b[1]), (b[2], b[3])) for b in self.obstacles.tolist()]
+
+    # Square plot limits (x_min, x_max, y_min, y_max) covering agents, goals and obstacles plus a margin
+    def bounds(self, margin=2.0):
+        points = np.concatenate([self.positions, self.goals, self.obstacles[:, :2], self.obstacles[:, 2:]])
+        if len(points) == 0:
+            return (-6.0, 6.0, -6.0, 6.0)
+        center = 0.5 * (points.min(axis=0) + points.max(axis=0))
+        half = 0.5 * (points.max(axis=0) - points.min(axis=0)).max() + margin
+        return tuple(float(v) for v in (center[0] - half, center[0] + half, center[1] - half, center[1] + half))
+
+    def save(self, path):
+        np.savez(path, positions=self.positions, goals=self.goals, obstacles=self.obstacles,
+                 name=self.name, params=json.dumps(self.params))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(str(data["name"]), data["positions"], data["goals"], data["obstacles"],
+                       json.loads(str(data["params"])))
+
+# Obstacle array from (min_x, min_y, max_x, max_y) tuples
+def _boxes(corners):
+    return np.asarray(corners, dtype=float).reshape(-1, 4)
+
+# Place agents evenly on a circle and assign opposite positions as goals
+def _circle(num_agents, rng, radius=4.0):
+    angles = np.linspace(0, 2 * np.pi, num_agents, endpoint=False)
+    positions = radius * np.stack([np.cos(angles), np.sin(angles)], axis=1)
+    return positions, -positions, None
+
+# Circle scenario with four square obstacles placed between the agents and their goals
+def _circle_with_obstacles(num_agents, rng, radius=4.0, size=1.5):
+    positions, goals, _ = _circle(num_agents, rng, radius)
+    centers = np.array([(-1.5, 1.5), (1.5, 1.5), (-1.5, -1.5), (1.5, -1.5)])
+    obstacles = np.concatenate([centers - size / 2, centers + size / 2], axis=1)
+    return positions, goals, obstacles
+
+# Random positions with a guaranteed minimum spacing: distinct cells of a square lattice with pitch
+# `spacing` inside [x0, x1] x [y0, y1], each jittered by up to 20% of the pitch. Cells within half a
+# pitch of the (M, 4) `blocked` rectangles are never used.
+def _lattice_sample(rng, count, x0, x1, y0, y1, spacing, blocked=None):
+    nx = max(1, int((x1 - x0) / spacing + 1e-9))
+    ny = max(1, int((y1 - y0) / spacing + 1e-9))
+    cells = np.arange(nx * ny)
+    if blocked is not None and len(blocked):
+        from obstacles import ObstacleSet
+        centers = np.array([x0, y0]) + spacing * (np.stack([cells // ny, cells % ny], axis=1) + 0.5)
+        grown = np.asarray(blocked) + 0.5 * spacing * np.array([-1, -1, 1, 1])
+        cells = cells[~ObstacleSet(grown, cell_size=max(spacing, 1.0)).contains(centers)]
+    if count > len(cells):
+        raise ValueError(f"Area too small for {count} agents at spacing {spacing}")
+    cells = rng.choice(cells, size=count, replace=False)
+    offsets = np.stack([cells // ny, cells % ny], axis=1) + 0.5 + rng.uniform(-0.2, 0.2, size=(count, 2))
+    return np.array([x0, y0]) + spacing * offsets
+
+# Depth of a block of `count` agents in a lane `width` wide, leaving a third of the lattice cells empty
+def _block_depth(count, width, spacing):
+    rows = max(1, int(width / spacing + 1e-9))
+    return max(1, int(np.ceil(1.5 * count / rows))) * spacing
+
+# Default lane width: grows with the crowd so that large scenarios stay roughly square
+def _lane_width(num_agents, spacing):
+    return max(4.0, 0.5 * spacing * np.sqrt(num_agents))
+
+# Two groups start at opposite ends of a walled corridor and swap ends
+def _bidirectional_corridor(num_agents, rng, length=20.0, width=None, spacing=0.6, wall=0.5):
+    width = _lane_width(num_agents, spacing) if width is None else width
+    half_l, half_w = length / 2, width / 2
+    n_left = (num_agents + 1) // 2
+    depth = _block_depth(n_left, width, spacing)
+    left = _lattice_sample(rng, n_left, -half_l - depth, -half_l, -half_w, half_w, spacing)
+    right = _lattice_sample(rng, num_agents - n_left, half_l, half_l + depth, -half_w, half_w, spacing)
+    positions = np.concatenate([left, right])
+    goals = positions.copy()
+    goals[:, 0] = -goals[:, 0]  # Mirror to the other end of the corridor
+    end = half_l + depth + 1.0  # Walls run along the waiting areas too
+    obstacles = _boxes([(-end, half_w, end, half_w + wall), (-end, -half_w - wall, end, -half_w)])
+    return positions, goals, obstacles
 
-    if scenario_type in ["circle", "circle_with_obstacles"]:
-        # Place agents evenly on a circle and assign opposite positions as goals
-        radius = 4.0  # Radius of the circle
-        angles = np.linspace(0, 2 * np.pi, num_agents, endpoint=False)
+# Two perpendicular streams (west to east and south to north) crossing at the origin
+def _crossing_flows(num_agents, rng, distance=8.0, width=None, spacing=0.6):
+    width = _lane_width(num_agents, spacing) if width is None else width
+    distance = max(distance, width / 2 + spacing)  # Keep the two waiting blocks apart
+    n_h = (num_agents + 1) // 2
+    depth = _block_depth(n_h, width, spacing)
+    horizontal = _lattice_sample(rng, n_h, -distance - depth, -distance, -width / 2, width / 2, spacing)
+    vertical = _lattice_sample(rng, num_agents - n_h, -width / 2, width / 2, -distance - depth, -distance, spacing)
+    positions = np.concatenate([horizontal, vertical])
+    goals = positions.copy()
+    goals[:n_h, 0] += 2 * distance + depth
+    goals[n_h:, 1] += 2 * distance + depth
+    return positions, goals, None
 
-        for theta in angles:
-            pos = radius * np.array([np.cos(theta), np.sin(theta)])  # Agent start position on circle
-            goal = -pos  # Goal is diametrically opposite to start position
-            agents_info.append((pos, goal))
+# Random starts and goals in a square whose size keeps the agent density (agents per unit area) constant,
+# optionally scattered with num_obstacles random square obstacles that no agent starts or ends in
+def _random_field(num_agents, rng, density=0.5, spacing=0.6, num_obstacles=0, obstacle_size=1.0):
+    # Obstacles (with a clearance margin) enlarge the field, so the free space keeps the requested density
+    half = 0.5 * np.sqrt(num_agents / density + 2 * num_obstacles * (obstacle_size + spacing) ** 2)
+    obstacles = None
+    if num_obstacles:
+        centers = rng.uniform(-half, half, size=(num_obstacles, 2))
+        obstacles = np.concatenate([centers - obstacle_size / 2, centers + obstacle_size / 2], axis=1)
+    positions = _lattice_sample(rng, num_agents, -half, half, -half, half, spacing, blocked=obstacles)
+    goals = _lattice_sample(rng, num_agents, -half, half, -half, half, spacing, blocked=obstacles)
+    return positions, goals, obstacles
 
-    else:
-        # Raise an error if the scenario type is unsupported
+# Uniformly random starts and goals with no minimum spacing (overlaps allowed) at `density` agents per
+# unit area; a stress case for neighbor search and collision avoidance
+def _random_crowd(num_agents, rng, density=1.0):
+    half = 0.5 * np.sqrt(num_agents / density)
+    positions = rng.uniform(-half, half, size=(num_agents, 2))
+    goals = rng.uniform(-half, half, size=(num_agents, 2))
+    return positions, goals, None
+
+# Agents on a square lattice, each heading to the point-mirrored lattice position
+def _grid(num_agents, rng, spacing=1.0):
+    side = int(np.ceil(np.sqrt(num_agents)))
+    idx = np.arange(num_agents)
+    positions = spacing * (np.stack([idx % side, idx // side], axis=1) - (side - 1) / 2)
+    return positions, -positions, None
+
+# Random perfect maze (depth-first carving) of cells x cells rooms; agents enter at the bottom-left
+# corner from the west and leave at the top-right corner to the east
+def _maze(num_agents, rng, cells=8, cell_size=3.0, wall=0.3, spacing=0.6):
+    # Carve passages: walls are removed between neighbors visited by a randomized depth-first walk
+    right_open = np.zeros((cells, cells), dtype=bool)  # Passage from (i, j) to (i + 1, j)
+    up_open = np.zeros((cells, cells), dtype=bool)     # Passage from (i, j) to (i, j + 1)
+    visited = np.zeros((cells, cells), dtype=bool)
+    stack = [(0, 0)]
+    visited[0, 0] = True
+    while stack:
+        i, j = stack[-1]
+        options = [(di, dj) for di, dj in ((1, 0), (-1, 0), (0, 1), (0, -1))
+                   if 0 <= i + di < cells and 0 <= j + dj < cells and not visited[i + di, j + dj]]
+        if not options:
+            stack.pop()
+            continue
+        di, dj = options[rng.integers(len(options))]
+        ni, nj = i + di, j + dj
+        if di:
+            right_open[min(i, ni), j] = True
+        else:
+            up_open[i, min(j, nj)] = True
+        visited[ni, nj] = True
+        stack.append((ni, nj))
+
+    # Wall rectangles for all closed interior edges, plus the outer boundary with the two openings
+    origin = -cells * cell_size / 2
+    extent = cells * cell_size
+    ii, jj = np.nonzero(~right_open[:-1, :])
+    x = origin + (ii + 1) * cell_size
+    vertical = np.stack([x - wall / 2, origin + jj * cell_size, x + wall / 2, origin + (jj + 1) * cell_size], axis=1)
+    ii, jj = np.nonzero(~up_open[:, :-1])
+    y = origin + (jj + 1) * cell_size
+    horizontal = np.stack([origin + ii * cell_size, y - wall / 2, origin + (ii + 1) * cell_size, y + wall / 2], axis=1)
+    outer = _boxes([(origin, origin - wall, origin + extent, origin),
+                    (origin, origin + extent, origin + extent, origin + extent + wall),
+                    (origin - wall, origin + cell_size, origin, origin + extent),
+                    (origin + extent, origin, origin + extent + wall, origin + extent - cell_size)])
+    obstacles = np.concatenate([vertical, horizontal, outer])
+
+    # Agents wait in a block west of the entrance; goals are the same block shifted past the exit
+    height = max(cell_size, _lane_width(num_agents, spacing))
+    depth = _block_depth(num_agents, height, spacing)
+    y0 = origin + cell_size / 2 - height / 2
+    positions = _lattice_sample(rng, num_agents, origin - 1.0 - depth, origin - 1.0, y0, y0 + height, spacing)
+    goals = positions + np.array([extent + depth + 2.0, extent - cell_size])
+    return positions, goals, obstacles
+
+# Registry of scenario families: name -> generator(num_agents, rng, **params) -> (positions, goals, obstacles)
+SCENARIOS = {
+    "circle": _circle,
+    "circle_with_obstacles": _circle_with_obstacles,
+    "bidirectional_corridor": _bidirectional_corridor,
+    "crossing_flows": _crossing_flows,
+    "random_field": _random_field,
+    "random_crowd": _random_crowd,
+    "grid": _grid,
+    "maze": _maze,
+}
+
+# Generate a scenario deterministically from its name, agent count, seed and family parameters
+def generate_scenario(scenario_type, num_agents, seed=0, **params):
+    if scenario_type not in SCENARIOS:
+        raise ValueError(f"Unknown scenario type: {scenario_type}")
+    rng = np.random.default_rng(seed)
+    positions, goals, obstacles = SCENARIOS[scenario_type](num_agents, rng, **params)
+    return Scenario(scenario_type, positions, goals, obstacles, params=dict(params, seed=seed, num_agents=num_agents))
+
+# Create (unstarted) agent nodes with the initial positions and goals of a Scenario. Controllers bind
+# node state to their own agent store, so build fresh nodes for every controller.
+def build_nodes(scenario):
+    from Node import Node
+
+    nodes = []
+    for uid, (pos, goal) in enumerate(scenario.agents_info()):
+        node = Node(uid)
+        node.setState([pos[0], pos[1], 0.0])
+        node.goal = goal.copy()
+        nodes.append(node)
+    return nodes
+
+# Default on-disk cache location, overridable with the RVO_SCENARIO_CACHE environment variable
+def default_cache_dir():
+    return os.environ.get("RVO_SCENARIO_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "rvo_scenarios"))
+
+# Generate a scenario or load it from the on-disk cache; cache_dir=False disables caching
+def load_scenario(scenario_type, num_agents, seed=0, cache_dir=None, **params):
+    if scenario_type not in SCENARIOS:
         raise ValueError(f"Unknown scenario type: {scenario_type}")
+    if cache_dir is False:
+        return generate_scenario(scenario_type, num_agents, seed=seed, **params)
+
+    cache_dir = cache_dir or default_cache_dir()
+    key = json.dumps([SCENARIO_CACHE_VERSION, scenario_type, num_agents, seed, sorted(params.items())])
+    path = os.path.join(cache_dir, f"{scenario_type}_{num_agents}_{hashlib.sha1(key.encode()).hexdigest()[:16]}.npz")
+    if os.path.exists(path):
+        return Scenario.load(path)
+
+    scenario = generate_scenario(scenario_type, num_agents, seed=seed, **params)
+    os.makedirs(cache_dir, exist_ok=True)
+    # Write to a temporary file and rename, so concurrent sweep workers never read a partial file
+    fd, tmp_path = tempfile.mkstemp(suffix=".npz", dir=cache_dir)
+    with os.fdopen(fd, "wb") as f:
+        scenario.save(f)
+    os.replace(tmp_path, path)
+    return scenario
+
+# Generate initial positions and goal destinations for a given scenario type
+def setup_scenario(scenario_type, num_agents):
+    # List of (initial_position, goal_position) pairs for all agents
+    return generate_scenario(scenario_type, num_agents).agents_info()
 
-    return agents_info
+# Rectangular obstacles for a given scenario type, as a list of (min_xy, max_xy) corners
+def setup_obstacles(scenario_type):
+    return generate_scenario(scenario_type, 0).obstacle_list()
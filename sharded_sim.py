@@ -0,0 +1,268 @@
+# sharded_sim.py
+# Domain-decomposed simulation of a single large crowd across worker processes.
+# The world's bounding box is split into tx x ty spatial tiles with one worker process per tile. Agent
+# state lives in shared memory (multiprocessing.shared_memory) in the same row order as the
+# single-process PyRVOController; positions are double-buffered so that workers read the positions
+# at the start of the step while writing the next ones. Each step:
+#   1. every worker reads its own agents plus the halo (agents of adjacent tiles within neighbor_dist
+#      of the shared border), computes the heuristic velocities of its own agents only and writes their
+#      new positions and velocities;
+#   2. it reports agents that left its tile (migration) and agents now near a border (next halo);
+#   3. the coordinator routes migrants and halo indices to the tiles that need them.
+# Pair contributions are accumulated in global row order, so the result matches the single-process
+# vectorized heuristic engine exactly. ORCA mode is not sharded (its randomized constraint order is
+# global).
+#
+# Example:
+#     python sharded_sim.py --agents 100000 --tiles 4 2 --steps 20 --verify
+
+import argparse
+import multiprocessing as mp
+import time
+from multiprocessing import shared_memory
+import numpy as np
+
+# Shared (N, ...) arrays: two position buffers, velocities, goals and maximum speeds
+_SHARED_ARRAYS = {"positions0": 2, "positions1": 2, "velocities": 2, "goals": 2, "max_speeds": 0}
+
+class TileGrid:
+    def __init__(self, bounds, tiles, halo):
+        # tiles[0] x tiles[1] equal tiles over bounds (x_min, y_min, x_max, y_max); agents outside the
+        # bounds belong to the nearest edge tile. halo is the border width whose agents neighbors need.
+        self.origin = np.array(bounds[:2], dtype=float)
+        self.shape = np.array(tiles, dtype=np.int64)
+        self.size = (np.array(bounds[2:], dtype=float) - self.origin) / self.shape
+        self.halo = halo
+        self.count = int(self.shape.prod())
+        # adjacent[a, b]: tiles a and b share an edge or a corner (a tile is not adjacent to itself)
+        coords = np.stack(np.unravel_index(np.arange(self.count), tuple(self.shape)), axis=1)
+        delta = np.abs(coords[:, None, :] - coords[None, :, :]).max(axis=2)
+        self.adjacent = delta == 1
+
+    # (P,) tile id of each of the (P, 2) points
+    def tile_of(self, points):
+        cell = np.floor((points - self.origin) / self.size).astype(np.int64)
+        cell = np.clip(cell, 0, self.shape - 1)
+        return cell[:, 0] * self.shape[1] + cell[:, 1]
+
+    # Mask of points within `halo` of an edge their tile shares with another tile
+    def near_border(self, points, tiles):
+        cell = np.stack(np.unravel_index(tiles, tuple(self.shape)), axis=1)
+        low = self.origin + cell * self.size
+        high = low + self.size
+        near = ((points - low < self.halo) & (cell > 0)) | ((high - points < self.halo) & (cell < self.shape - 1))
+        return near.any(axis=1)
+
+# Attach to the shared arrays of an N-agent simulation
+def _attach(names, num_agents):
+    blocks = {key: shared_memory.SharedMemory(name=name) for key, name in names.items()}
+    arrays = {key: np.ndarray((num_agents, width) if width else (num_agents,), dtype=np.float64, buffer=blocks[key].buf)
+              for key, width in _SHARED_ARRAYS.items()}
+    return blocks, arrays
+
+# Worker process: owns one tile and advances its agents on every "step" command
+def _tile_worker(tile, conn, names, num_agents, grid, controller_kwargs):
+    from pyrvo_adapter import PyRVOController
+
+    blocks, arrays = _attach(names, num_agents)
+    controller = PyRVOController([], **controller_kwargs)  # Used only for its batched math and obstacle queries
+    owned = np.zeros(0, dtype=np.int64)                    # Global rows of the agents in this tile, ascending
+    try:
+        while True:
+            message = conn.recv()
+            if message is None:
+                break
+            read, arrivals, halo = message
+            start = time.perf_counter()
+            owned = np.union1d(owned, arrivals)
+            positions_in = arrays[f"positions{read}"]
+            positions_out = arrays[f"positions{1 - read}"]
+
+            # Own agents and halo in ascending global order, so pairs are accumulated as in one process
+            rows = np.union1d(owned, halo)
+            active = np.isin(rows, owned, assume_unique=True)
+            positions = positions_in[rows]
+            velocities = controller.heuristic_velocities(positions, arrays["goals"][rows], arrays["max_speeds"][rows], active)
+            new_positions = controller.advance(positions[active], velocities)
+            positions_out[owned] = new_positions
+            arrays["velocities"][owned] = velocities
+
+            # Migration and next step's halo, from the new positions
+            tiles = grid.tile_of(new_positions)
+            leaving = tiles != tile
+            border = grid.near_border(new_positions, tiles)
+            reply = (owned[leaving], tiles[leaving], owned[border], tiles[border],
+                     {"agents": len(owned), "halo": len(rows) - len(owned), "compute_sec": time.perf_counter() - start})
+            owned = owned[~leaving]
+            conn.send(reply)
+    finally:
+        for block in blocks.values():
+            block.close()
+
+class ShardedController:
+    def __init__(self, agents, tiles=None, workers=None, time_step=0.05, neighbor_dist=1.0, obstacles=None,
+                 num_fallback_samples=60, max_speed=1.0, neighbor_index="grid", fallback_coarse_samples=None,
+                 fallback_refine_samples=8, bounds=None):
+        # Multi-process counterpart of PyRVOController(engine="vectorized", mode="heuristic") for a fixed set
+        # of agents (nodes with uid, state and goal). tiles is (tx, ty); by default `workers` (default: CPU
+        # count) is factored into a near-square grid. Tiles are merged until each is at least neighbor_dist wide.
+        self.num_agents = len(agents)
+        self.uids = [a.uid for a in agents]             # UID of each row, as in the single-process store
+        self.time_step = time_step
+        self.neighbor_dist = neighbor_dist
+        self.last_step_time = 0.0                       # Wall-clock duration of the most recent step() call
+        self.step_count = 0
+        self.last_worker_stats = []                     # Per-tile agents, halo size and compute time of the last step
+
+        positions = np.array([np.asarray(a.state, dtype=float)[:2] for a in agents]).reshape(-1, 2)
+        goals = np.array([np.asarray(a.goal, dtype=float) for a in agents]).reshape(-1, 2)
+        if bounds is None:
+            points = np.concatenate([positions, goals]) if self.num_agents else np.zeros((1, 2))
+            bounds = (*points.min(axis=0), *points.max(axis=0))
+        extent = np.maximum(np.array(bounds[2:]) - np.array(bounds[:2]), 1e-9)
+        if tiles is None:
+            workers = workers or mp.cpu_count()
+            tx = max(1, int(round(np.sqrt(workers * extent[0] / extent[1]))))
+            tiles = (min(tx, workers), max(1, workers // min(tx, workers)))
+        halo = neighbor_dist * (1 + 1e-6)
+        # Halo agents must come from adjacent tiles only, so tiles may not be narrower than the halo
+        tiles = tuple(int(max(1, min(t, e // halo))) for t, e in zip(tiles, extent))
+        self.grid = TileGrid(bounds, tiles, halo)
+
+        # Shared memory blocks, initialized from the agents
+        self._blocks = {}
+        names = {}
+        for key, width in _SHARED_ARRAYS.items():
+            size = max(8, 8 * self.num_agents * max(width, 1))
+            self._blocks[key] = shared_memory.SharedMemory(create=True, size=size)
+            names[key] = self._blocks[key].name
+        self.arrays = {key: np.ndarray((self.num_agents, width) if width else (self.num_agents,), dtype=np.float64,
+                                       buffer=self._blocks[key].buf) for key, width in _SHARED_ARRAYS.items()}
+        self.arrays["positions0"][:] = positions
+        self.arrays["positions1"][:] = positions
+        self.arrays["velocities"][:] = 0.0
+        self.arrays["goals"][:] = goals
+        self.arrays["max_speeds"][:] = 1.0              # Same per-agent default as PyRVOController.add_agent
+        self.read = 0                                   # Position buffer holding the current positions
+
+        if obstacles is not None and not isinstance(obstacles, list):
+            obstacles = obstacles.to_list()
+        controller_kwargs = {"time_step": time_step, "neighbor_dist": neighbor_dist, "obstacles": obstacles,
+                             "num_fallback_samples": num_fallback_samples, "max_speed": max_speed,
+                             "neighbor_index": neighbor_index, "fallback_coarse_samples": fallback_coarse_samples,
+                             "fallback_refine_samples": fallback_refine_samples}
+        self._conns = []
+        self._workers = []
+        for tile in range(self.grid.count):
+            parent, child = mp.Pipe()
+            worker = mp.Process(target=_tile_worker, args=(tile, child, names, self.num_agents, self.grid, controller_kwargs),
+                                daemon=True)
+            worker.start()
+            self._conns.append(parent)
+            self._workers.append(worker)
+
+        # Initial ownership and halo, computed like the workers do after each step
+        rows = np.arange(self.num_agents)
+        tiles = self.grid.tile_of(positions)
+        border = self.grid.near_border(positions, tiles)
+        self._route(rows, tiles, rows[border], tiles[border])
+
+    @property
+    def num_tiles(self):
+        return self.grid.count
+
+    # Current (N, 2) positions and velocities (views of shared memory, valid until the next step)
+    @property
+    def positions(self):
+        return self.arrays[f"positions{self.read}"]
+
+    @property
+    def velocities(self):
+        return self.arrays["velocities"]
+
+    def _route(self, migrant_rows, migrant_tiles, border_rows, border_tiles):
+        # Arrivals per destination tile and each tile's halo: border agents of adjacent tiles
+        order = np.argsort(migrant_tiles, kind="stable")
+        split = np.searchsorted(migrant_tiles[order], np.arange(self.grid.count + 1))
+        self._arrivals = [migrant_rows[order[split[t]:split[t + 1]]] for t in range(self.grid.count)]
+        self._halo = [border_rows[self.grid.adjacent[t, border_tiles]] for t in range(self.grid.count)]
+
+    # Advance all agents by one time step
+    def step(self):
+        start = time.perf_counter()
+        for conn, arrivals, halo in zip(self._conns, self._arrivals, self._halo):
+            conn.send((self.read, arrivals, halo))
+        replies = [conn.recv() for conn in self._conns]
+        self.read = 1 - self.read
+        cat = lambda k: np.concatenate([r[k] for r in replies])
+        self._route(cat(0), cat(1), cat(2), cat(3))
+        self.last_worker_stats = [r[4] for r in replies]
+        self.step_count += 1
+        self.last_step_time = time.perf_counter() - start
+
+    # Copy the current positions into the nodes' state (nodes in the order they were given)
+    def sync_nodes(self, nodes):
+        positions = self.positions
+        for row, node in enumerate(nodes):
+            node.state[:2] = positions[row]
+
+    # Stop the workers and release the shared memory
+    def close(self):
+        for conn in self._conns:
+            try:
+                conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for worker in self._workers:
+            worker.join(timeout=5)
+        self._conns, self._workers = [], []
+        for block in self._blocks.values():
+            block.close()
+            block.unlink()
+        self._blocks = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+if __name__ == "__main__":
+    from scenario_setup import build_nodes, load_scenario
+    from pyrvo_adapter import PyRVOController
+
+    parser = argparse.ArgumentParser(description="Run one large crowd sharded over worker processes")
+    parser.add_argument("--scenario", default="random_field")
+    parser.add_argument("--agents", type=int, default=100000)
+    parser.add_argument("--tiles", type=int, nargs=2, default=None, metavar=("TX", "TY"))
+    parser.add_argument("--workers", type=int, default=None, help="Tile count when --tiles is not given")
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verify", action="store_true", help="Also run the single-process controller and compare")
+    args = parser.parse_args()
+
+    scenario = load_scenario(args.scenario, args.agents, seed=args.seed)
+
+    with ShardedController(build_nodes(scenario), tiles=args.tiles, workers=args.workers,
+                           obstacles=scenario.obstacle_list()) as sharded:
+        print(f"{args.agents} agents on {sharded.grid.shape[0]} x {sharded.grid.shape[1]} tiles")
+        start = time.perf_counter()
+        for _ in range(args.steps):
+            sharded.step()
+        elapsed = time.perf_counter() - start
+        halo = sum(s["halo"] for s in sharded.last_worker_stats)
+        print(f"sharded: {args.steps / elapsed:.2f} steps/s ({1e3 * elapsed / args.steps:.1f} ms/step), "
+              f"{halo} halo agents in the last step")
+        sharded_positions = sharded.positions.copy()
+
+    if args.verify:
+        single = PyRVOController(build_nodes(scenario), obstacles=scenario.obstacle_list())
+        start = time.perf_counter()
+        for _ in range(args.steps):
+            single.step()
+        elapsed = time.perf_counter() - start
+        print(f"single:  {args.steps / elapsed:.2f} steps/s ({1e3 * elapsed / args.steps:.1f} ms/step)")
+        same = np.array_equal(single.store.positions, sharded_positions)
+        print(f"positions identical: {same}")
+        if not same:
+            print(f"max deviation: {np.abs(single.store.positions - sharded_positions).max():.3e}")
@@ -0,0 +1,225 @@
+# simulation_server.py
+# Asyncio-based scheduler that runs many independent headless simulations concurrently.
+# Every submitted scenario is an asyncio task; its CPU-heavy work (building the scenario and stepping
+# the controller) runs in a fixed set of `max_workers` worker processes, so scenarios step in parallel
+# on separate cores instead of taking turns on the GIL. Each simulation lives inside the worker it was
+# assigned to (the least loaded one) and is advanced there in short slices; only positions and the final
+# summary are sent back. No thread or process is created per agent or per scenario: the server uses
+# the event loop thread, max_workers processes and a constant number of executor threads per process,
+# however many scenarios or agents are running. Slices queued on the same worker advance round-robin.
+#
+# Local API (inside a running event loop):
+#     async with SimulationServer(max_workers=4) as server:
+#         job = await server.submit("circle", 40, max_steps=500)
+#         async for step, positions in server.stream(job):
+#             ...
+#         summary = await server.result(job)
+#
+# Example:
+#     python simulation_server.py --scenarios 100 --agents 40 --workers 4
+
+import argparse
+import asyncio
+import itertools
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from headless_runner import HeadlessSimulation
+
+_SIMULATIONS = {}  # Worker process: job id -> HeadlessSimulation
+
+# Worker-side: build a simulation and keep it in this process
+def _create_simulation(job_id, scenario_type, num_agents, simulation_kwargs):
+    _SIMULATIONS[job_id] = HeadlessSimulation(scenario_type, num_agents, **simulation_kwargs)
+
+# Worker-side: advance one simulation by up to `steps` steps, copying positions if streamed.
+# Returns the frames, the step index and whether the simulation is complete.
+def _run_slice(job_id, steps, max_steps, stop_at_goals, record):
+    sim = _SIMULATIONS[job_id]
+    complete = lambda: sim.step_index >= max_steps or (stop_at_goals and sim.all_goals_reached())
+    frames = []
+    for _ in range(steps):
+        if complete():
+            break
+        sim.step()
+        if record:
+            frames.append((sim.step_index, sim.controller.store.positions.copy()))
+    return frames, sim.step_index, complete()
+
+# Worker-side: return the final summary and drop the simulation
+def _finish_simulation(job_id):
+    return _SIMULATIONS.pop(job_id).summary()
+
+# Worker-side: drop a cancelled or failed simulation
+def _discard_simulation(job_id):
+    _SIMULATIONS.pop(job_id, None)
+
+class SimulationJob:
+    def __init__(self, job_id, scenario_type, num_agents, max_steps, stop_at_goals, worker):
+        # Book-keeping for one submitted scenario; the simulation itself lives in a worker process
+        self.job_id = job_id                      # Server-assigned identifier
+        self.scenario_type = scenario_type        # Scenario family name
+        self.num_agents = num_agents              # Number of agents
+        self.max_steps = max_steps                # Step limit
+        self.stop_at_goals = stop_at_goals        # Stop early once every agent has reached its goal
+        self.worker = worker                      # Index of the worker process holding the simulation
+        self.step = 0                             # Steps completed, as last reported by the worker
+        self.status = "pending"                   # pending, running, done, cancelled or error
+        self.subscribers = []                     # asyncio.Queue per active stream() consumer
+        self.finished = False                     # Set once no more steps will be published
+        self.task = None                          # asyncio.Task driving the simulation
+
+class SimulationServer:
+    def __init__(self, max_workers=4, steps_per_slice=1, stream_buffer=64, max_active=None):
+        # max_workers processes run all CPU work; steps_per_slice steps are run per offloaded call;
+        # stream_buffer bounds each stream's queue (a full queue pauses its simulation); max_active
+        # optionally limits how many scenarios are built and stepped at the same time
+        self.max_workers = max_workers
+        self.steps_per_slice = steps_per_slice
+        self.stream_buffer = stream_buffer
+        # One single-process executor per worker, so that every call for a job reaches the process
+        # that holds its simulation
+        self.executors = [ProcessPoolExecutor(max_workers=1) for _ in range(max_workers)]
+        self.load = [0] * max_workers             # Unfinished jobs assigned to each worker
+        self.active = asyncio.Semaphore(max_active) if max_active else None
+        self.jobs = {}                            # Job id -> SimulationJob
+        self._ids = itertools.count()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    # Submit a scenario and return its job id immediately; simulation_kwargs go to HeadlessSimulation
+    # (seed, scenario_params and PyRVOController options such as mode or neighbor_index)
+    async def submit(self, scenario_type, num_agents, max_steps=1000, stop_at_goals=True, **simulation_kwargs):
+        worker = self.load.index(min(self.load))
+        self.load[worker] += 1
+        job = SimulationJob(next(self._ids), scenario_type, num_agents, max_steps, stop_at_goals, worker)
+        job.task = asyncio.get_running_loop().create_task(self._run(job, simulation_kwargs))
+        self.jobs[job.job_id] = job
+        return job.job_id
+
+    async def _run(self, job, simulation_kwargs):
+        loop = asyncio.get_running_loop()
+        executor = self.executors[job.worker]
+        held = False                              # True while the worker may hold this job's simulation
+        try:
+            if self.active is not None:
+                await self.active.acquire()
+            try:
+                held = True
+                await loop.run_in_executor(executor, _create_simulation, job.job_id, job.scenario_type,
+                                           job.num_agents, simulation_kwargs)
+                job.status = "running"
+                complete = False
+                while not complete:
+                    frames, job.step, complete = await loop.run_in_executor(
+                        executor, _run_slice, job.job_id, self.steps_per_slice, job.max_steps,
+                        job.stop_at_goals, bool(job.subscribers))
+                    for frame in frames:
+                        for queue in list(job.subscribers):
+                            await queue.put(frame)
+                summary = await loop.run_in_executor(executor, _finish_simulation, job.job_id)
+                held = False
+            finally:
+                if self.active is not None:
+                    self.active.release()
+            job.status = "done"
+            return summary
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+            raise
+        except Exception:
+            job.status = "error"
+            raise
+        finally:
+            self.load[job.worker] -= 1
+            if held:
+                try:
+                    executor.submit(_discard_simulation, job.job_id)  # Free the worker's copy
+                except RuntimeError:
+                    pass  # Executor already shut down or broken
+            job.finished = True
+            for queue in job.subscribers:
+                if not queue.full():
+                    queue.put_nowait(None)  # Wake idle consumers; full queues are drained first
+
+    # Async iterator of (step_index, (N, 2) positions) for every step from now until the job ends
+    async def stream(self, job_id):
+        job = self.jobs[job_id]
+        queue = asyncio.Queue(self.stream_buffer)
+        job.subscribers.append(queue)
+        try:
+            while not (job.finished and queue.empty()):
+                frame = await queue.get()
+                if frame is None:
+                    break
+                yield frame
+        finally:
+            job.subscribers.remove(queue)
+
+    # Wait for a job and return its MetricsRecorder summary (re-raises the job's error, if any)
+    async def result(self, job_id):
+        return await asyncio.shield(self.jobs[job_id].task)
+
+    # Current state of a job
+    def status(self, job_id):
+        job = self.jobs[job_id]
+        return {
+            "job_id": job.job_id,
+            "scenario": job.scenario_type,
+            "agents": job.num_agents,
+            "status": job.status,
+            "step": job.step,
+            "max_steps": job.max_steps,
+        }
+
+    # Cancel a job; a slice already running in its worker completes, then the job stops
+    def cancel(self, job_id):
+        self.jobs[job_id].task.cancel()
+
+    # Cancel unfinished jobs and shut down the worker processes
+    async def close(self):
+        tasks = [job.task for job in self.jobs.values() if not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for executor in self.executors:
+            executor.shutdown(wait=True)
+
+async def _demo(args):
+    threads_before = threading.active_count()
+    peak_threads = threads_before
+    start = time.perf_counter()
+    async with SimulationServer(max_workers=args.workers, steps_per_slice=args.steps_per_slice) as server:
+        jobs = [await server.submit(args.scenario, args.agents, max_steps=args.steps, seed=seed)
+                for seed in range(args.scenarios)]
+
+        # Stream the first scenario while the others run
+        streamed = 0
+        async for step, positions in server.stream(jobs[0]):
+            streamed += 1
+            peak_threads = max(peak_threads, threading.active_count())
+        summaries = [await server.result(job) for job in jobs]
+        peak_threads = max(peak_threads, threading.active_count())
+    elapsed = time.perf_counter() - start
+
+    total_steps = sum(s["steps"] for s in summaries)
+    goals = sum(s["goals_reached"] for s in summaries)
+    print(f"{len(summaries)} scenarios x {args.agents} agents: {total_steps} steps in {elapsed:.2f} s "
+          f"({total_steps / elapsed:.1f} steps/s), {goals} goals reached")
+    print(f"Streamed {streamed} frames from job {jobs[0]}")
+    print(f"Threads: {threads_before} before, peak {peak_threads}; worker processes: {args.workers}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run many scenarios concurrently on a fixed set of worker processes")
+    parser.add_argument("--scenario", default="circle")
+    parser.add_argument("--scenarios", type=int, default=20, help="Number of concurrent scenarios")
+    parser.add_argument("--agents", type=int, default=40, help="Agents per scenario")
+    parser.add_argument("--steps", type=int, default=500, help="Maximum steps per scenario")
+    parser.add_argument("--workers", type=int, default=4, help="Worker processes")
+    parser.add_argument("--steps-per-slice", type=int, default=1, help="Steps per offloaded call")
+    args = parser.parse_args()
+    asyncio.run(_demo(args))
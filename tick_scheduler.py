@@ -0,0 +1,36 @@
+# tick_scheduler.py
+# Synchronizes the per-agent Node threads so that each simulation tick runs exactly one
+# controller step and one metrics record. Every Node waits at a shared barrier; the last
+# thread to arrive runs the global update, after which all Nodes read their new velocity.
+
+from threading import Barrier, BrokenBarrierError
+import numpy as np
+
+class TickScheduler:
+    def __init__(self, nodes, controller, metrics=None):
+        # Coordinate a fixed set of Node threads around one shared controller
+        self.nodes = nodes                              # Nodes driven by this scheduler
+        self.controller = controller                    # Controller advanced once per tick
+        self.metrics = metrics                          # Optional metrics recorder, updated once per tick
+        self.tick = 0                                   # Number of completed simulation ticks
+        self.barrier = Barrier(len(nodes), action=self._advance)
+
+    # Global update, executed by exactly one thread while all others wait at the barrier
+    def _advance(self):
+        self.controller.update_from_nodes(self.nodes)
+        self.controller.step()
+        if self.metrics is not None:
+            self.metrics.record_step(controller_time=self.controller.last_step_time)
+        self.tick += 1
+
+    # Control function to assign to every Node: blocks until the tick is complete, then returns the velocity
+    def control_fn(self, node):
+        try:
+            self.barrier.wait()
+        except BrokenBarrierError:
+            return np.zeros(2)  # Scheduler stopped: hold position until the thread terminates
+        return self.controller.get_velocity(node.uid)
+
+    # Release all waiting Nodes; call before stopping the Node threads
+    def stop(self):
+        self.barrier.abort()
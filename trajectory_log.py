@@ -0,0 +1,181 @@
+# trajectory_log.py
+# Streams simulation trajectories to disk and reads them back without re-running the simulation.
+# A recorded run is a directory holding append-only binary files (step-major, fixed agent count):
+#     positions.bin   (steps, N, 2) agent positions
+#     velocities.bin  (steps, N, 2) agent velocities
+#     metrics.bin     (steps, K) float64 per-step metrics, column names in meta.json
+#     static.npz      uids, start positions, goals and obstacles
+#     meta.json       shapes, dtypes, step count and run parameters
+# The writer buffers a fixed number of steps in preallocated arrays and appends them in chunks, so
+# memory use stays flat on long runs. The reader memory-maps the files for replay, plotting and
+# metric recomputation.
+#
+# Example:
+#     python trajectory_log.py runs/circle_40 --plot circle_40.png
+
+import argparse
+import json
+import os
+from types import SimpleNamespace
+import numpy as np
+
+# Per-step metric columns written by the headless runner
+METRIC_COLUMNS = ["collisions", "goals_reached", "controller_time_sec", "metrics_time_sec"]
+
+class TrajectoryWriter:
+    def __init__(self, path, uids, start_positions, goals, obstacles=None, chunk_steps=256,
+                 dtype=np.float32, metric_columns=METRIC_COLUMNS, params=None):
+        # Create (or overwrite) a run directory for len(uids) agents
+        self.path = path                                    # Run directory
+        self.num_agents = len(uids)                         # Fixed number of recorded agents
+        self.dtype = np.dtype(dtype)                        # Storage dtype for positions and velocities
+        self.metric_columns = list(metric_columns)          # Names of the per-step metric columns
+        self.chunk_steps = chunk_steps                      # Steps buffered in memory before each append
+        self.params = dict(params or {})                    # Free-form run parameters stored in meta.json
+        self.steps = 0                                      # Steps written so far (including buffered ones)
+
+        os.makedirs(path, exist_ok=True)
+        obstacles = np.zeros((0, 4)) if obstacles is None else np.asarray(obstacles, dtype=float).reshape(-1, 4)
+        np.savez(os.path.join(path, "static.npz"), uids=np.asarray(uids), start_positions=np.asarray(start_positions, dtype=float),
+                 goals=np.asarray(goals, dtype=float), obstacles=obstacles)
+
+        # Preallocated chunk buffers: memory stays constant however long the run is
+        self._positions = np.empty((chunk_steps, self.num_agents, 2), dtype=self.dtype)
+        self._velocities = np.empty((chunk_steps, self.num_agents, 2), dtype=self.dtype)
+        self._metrics = np.empty((chunk_steps, len(self.metric_columns)), dtype=np.float64)
+        self._buffered = 0
+        self._files = {name: open(os.path.join(path, f"{name}.bin"), "wb") for name in ("positions", "velocities", "metrics")}
+        self._write_meta()
+
+    # Record one step; positions and velocities are (N, 2), metrics a sequence matching metric_columns
+    def append(self, positions, velocities, metrics=()):
+        b = self._buffered
+        self._positions[b] = positions
+        self._velocities[b] = velocities
+        self._metrics[b] = np.nan
+        self._metrics[b, :len(metrics)] = metrics
+        self._buffered += 1
+        self.steps += 1
+        if self._buffered == self.chunk_steps:
+            self.flush()
+
+    # Append buffered steps to the files and update the step count in meta.json
+    def flush(self):
+        b = self._buffered
+        if b:
+            self._files["positions"].write(self._positions[:b].tobytes())
+            self._files["velocities"].write(self._velocities[:b].tobytes())
+            self._files["metrics"].write(self._metrics[:b].tobytes())
+            for f in self._files.values():
+                f.flush()
+            self._buffered = 0
+        self._write_meta()
+
+    def close(self):
+        if self._files:
+            self.flush()
+            for f in self._files.values():
+                f.close()
+            self._files = {}
+
+    def _write_meta(self):
+        meta = {
+            "num_agents": self.num_agents,
+            "steps": self.steps - self._buffered,          # Steps actually on disk
+            "dtype": self.dtype.str,
+            "metric_columns": self.metric_columns,
+            "params": self.params,
+        }
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class TrajectoryReader:
+    def __init__(self, path):
+        # Open a recorded run; positions, velocities and metrics are memory-mapped, not loaded
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        with np.load(os.path.join(path, "static.npz")) as static:
+            self.uids = static["uids"]                      # Agent UIDs, in column order
+            self.start_positions = static["start_positions"]  # (N, 2) initial positions
+            self.goals = static["goals"]                    # (N, 2) goal positions
+            self.obstacles = static["obstacles"]            # (M, 4) rectangles [min_x, min_y, max_x, max_y]
+        self.num_agents = self.meta["num_agents"]
+        self.metric_columns = self.meta["metric_columns"]
+        self.params = self.meta.get("params", {})
+
+        dtype = np.dtype(self.meta["dtype"])
+        self.positions = self._map("positions", dtype, (self.num_agents, 2))    # (steps, N, 2)
+        self.velocities = self._map("velocities", dtype, (self.num_agents, 2))  # (steps, N, 2)
+        self.metrics = self._map("metrics", np.dtype(np.float64), (len(self.metric_columns),))  # (steps, K)
+        self.steps = len(self.positions)
+
+    def _map(self, name, dtype, row_shape):
+        # Step count comes from the file size, so a run that is still being written can be read too
+        file_path = os.path.join(self.path, f"{name}.bin")
+        row_bytes = dtype.itemsize * int(np.prod(row_shape))
+        steps = os.path.getsize(file_path) // row_bytes if row_bytes else 0
+        if steps == 0:
+            return np.zeros((0,) + row_shape, dtype=dtype)
+        return np.memmap(file_path, dtype=dtype, mode="r", shape=(steps,) + row_shape)
+
+    # Per-step values of one metric column
+    def metric(self, name):
+        return self.metrics[:, self.metric_columns.index(name)]
+
+    # Recompute a MetricsRecorder summary from the recorded positions (e.g. with a different radius)
+    def recompute_metrics(self, radius=0.3, goal_threshold=0.3):
+        from metrics_recorder import MetricsRecorder
+
+        agents = [SimpleNamespace(uid=uid, state=np.array([p[0], p[1], 0.0]), goal=g)
+                  for uid, p, g in zip(self.uids.tolist(), self.start_positions, self.goals)]
+        metrics = MetricsRecorder(agents, radius=radius)
+        metrics.goal_threshold = goal_threshold
+        for t in range(self.steps):
+            metrics.record_step(positions=self.positions[t].astype(float))
+        if self.steps:
+            for a, p in zip(agents, self.positions[-1]):
+                a.state[:2] = p
+        return metrics.summarize()
+
+    # Plot all trajectories (every `stride`-th step) and obstacles into an image file
+    def plot(self, output_path, stride=1):
+        import matplotlib
+        matplotlib.use("Agg")
+        from matplotlib import pyplot as plt
+        import matplotlib.patches as patches
+
+        fig, ax = plt.subplots()
+        ax.set_aspect("equal", "box")
+        for b in self.obstacles:
+            ax.add_patch(patches.Rectangle((b[0], b[1]), b[2] - b[0], b[3] - b[1],
+                                           linewidth=1, edgecolor='r', facecolor='gray', alpha=0.5))
+        path = self.positions[::stride]
+        ax.plot(path[:, :, 0], path[:, :, 1], '-', lw=0.5)
+        ax.plot(self.start_positions[:, 0], self.start_positions[:, 1], 's', ms=3, color='k')
+        ax.plot(self.goals[:, 0], self.goals[:, 1], '*', ms=4, color='k')
+        fig.savefig(output_path)
+        plt.close(fig)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect a recorded trajectory")
+    parser.add_argument("path", help="Run directory written by TrajectoryWriter")
+    parser.add_argument("--radius", type=float, default=0.3, help="Collision radius for recomputed metrics")
+    parser.add_argument("--plot", default=None, help="Write a trajectory plot to this image file")
+    parser.add_argument("--stride", type=int, default=1, help="Plot every n-th step")
+    args = parser.parse_args()
+
+    run = TrajectoryReader(args.path)
+    print(f"{run.path}: {run.steps} steps, {run.num_agents} agents, {len(run.obstacles)} obstacles")
+    print("\n===== RECOMPUTED METRICS =====")
+    for k, v in run.recompute_metrics(radius=args.radius).items():
+        print(f"{k}: {v:.4f}" if isinstance(v, float) else f"{k}: {v}")
+    if args.plot:
+        run.plot(args.plot, stride=args.stride)
+        print(f"Trajectory plot written to {args.plot}")